@@ -0,0 +1,67 @@
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+from .views import (DownloadShoppingCartView, FavoriteBatchView, FavoriteView,
+                    ShoppingCartBatchView, ShoppingCartView,
+                    SubscribeBatchView, SubscribeView)
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.ASYNC_VIEW_WORKERS,
+    thread_name_prefix='async-views'
+)
+
+
+def in_pool(func):
+    """
+    Корутина, выполняющая func в ограниченном пуле потоков.
+    Соединения с базой закрываются до и после вызова, как в обычном
+    цикле запроса: у каждого потока пула своё соединение.
+    """
+
+    def call(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(call, thread_sensitive=False, executor=executor)
+
+
+def render(response):
+    if hasattr(response, 'render') and callable(response.render):
+        response.render()
+    return response
+
+
+def async_api_view(view):
+    """ Асинхронная обёртка над синхронным представлением DRF. """
+
+    def handle(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        # Потоковый ответ перебирает в своём потоке ASGI-обработчик
+        # foodgram.handlers.StreamingASGIHandler.
+        if response.streaming:
+            return response
+        return render(response)
+
+    run = in_pool(handle)
+
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        return await run(request, *args, **kwargs)
+
+    return wrapper
+
+
+favorite = async_api_view(FavoriteView.as_view())
+shopping_cart = async_api_view(ShoppingCartView.as_view())
+subscribe = async_api_view(SubscribeView.as_view())
+download_shopping_cart = async_api_view(DownloadShoppingCartView.as_view())
+favorite_batch = async_api_view(FavoriteBatchView.as_view())
+shopping_cart_batch = async_api_view(ShoppingCartBatchView.as_view())
+subscribe_batch = async_api_view(SubscribeBatchView.as_view())
@@ -0,0 +1,222 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.response import Response
+
+from foodgram.versions import get_versions, user_scope
+
+RESPONSE_PREFIX = 'api-response'
+
+
+def request_fingerprint(request, versions, *extra):
+    """ Хеш адреса, параметров запроса, Accept и меток версий. """
+
+    query = sorted(
+        (key, sorted(values)) for key, values in request.GET.lists()
+    )
+    raw = '|'.join([
+        request.scheme,
+        request.get_host(),
+        request.path,
+        repr(query),
+        request.META.get('HTTP_ACCEPT', ''),
+        repr(versions),
+        *map(str, extra),
+    ])
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def weak_opaque(tag):
+    """ ETag без признака слабого сравнения W/. """
+
+    return tag[2:] if tag.startswith('W/') else tag
+
+
+def etag_matches(header, etag):
+    """ Слабое сравнение If-None-Match с ETag, как требует RFC 7232. """
+
+    if not header or not etag:
+        return False
+    if header.strip() == '*':
+        return True
+    return any(
+        weak_opaque(tag) == weak_opaque(etag) for tag in parse_etags(header)
+    )
+
+
+def is_not_modified(request, etag, last_modified):
+    """ Проверка If-None-Match, а без него If-Modified-Since. """
+
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        return etag_matches(if_none_match, etag)
+    if_modified_since = parse_http_date_safe(
+        request.META.get('HTTP_IF_MODIFIED_SINCE', '')
+    )
+    return (
+        if_modified_since is not None
+        and last_modified is not None
+        and last_modified <= if_modified_since
+    )
+
+
+class NotModified(APIException):
+    status_code = status.HTTP_304_NOT_MODIFIED
+    default_detail = ''
+
+
+class CachedResponse(Exception):
+    """ Готовый ответ из кеша, найденный в initial(). """
+
+    def __init__(self, response):
+        super().__init__()
+        self.response = response
+
+
+class CachedResponseMixin:
+    """
+    Кеширование ответов на GET-запросы анонимных пользователей.
+    Ключ строится из адреса, отсортированных параметров запроса и меток
+    версий cache_scopes; изменение данных сдвигает метку, и старые
+    ответы просто перестают находиться. Кеш читается в initial(), то
+    есть после аутентификации, проверки прав и ограничения частоты
+    запросов, и только если пользователь не вошёл: ответы на каждого
+    пользователя вытесняли бы из кеша общие ответы и метки версий.
+    """
+
+    cache_scopes = ()
+    cache_timeout = None
+
+    def get_cache_scopes(self, request):
+        return self.cache_scopes
+
+    @staticmethod
+    def is_cacheable(request):
+        return (
+            request.method == 'GET'
+            and not request.user.is_authenticated
+        )
+
+    def get_response_cache_key(self, request):
+        versions = get_versions(*self.get_cache_scopes(request))
+        return f'{RESPONSE_PREFIX}:{request_fingerprint(request, versions)}'
+
+    @staticmethod
+    def not_modified(request, response):
+        """ Ответ 304, если закешированный ответ не изменился. """
+
+        etag = response.get('ETag')
+        last_modified = parse_http_date_safe(
+            response.get('Last-Modified', '')
+        )
+        if not is_not_modified(request, etag, last_modified):
+            return None
+        not_modified = Response(status=status.HTTP_304_NOT_MODIFIED)
+        for header in ('ETag', 'Last-Modified', 'Cache-Control', 'Vary'):
+            if response.has_header(header):
+                not_modified[header] = response[header]
+        return not_modified
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.response_cache_key = None
+        if not self.is_cacheable(request):
+            return
+        self.response_cache_key = self.get_response_cache_key(request)
+        response = cache.get(self.response_cache_key)
+        if response is not None:
+            raise CachedResponse(
+                self.not_modified(request, response) or response
+            )
+
+    def handle_exception(self, exc):
+        if isinstance(exc, CachedResponse):
+            self.response_cache_key = None
+            return exc.response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        key = getattr(self, 'response_cache_key', None)
+        if key and response.status_code == 200:
+            timeout = self.cache_timeout or settings.API_CACHE_TIMEOUT
+            if hasattr(response, 'add_post_render_callback'):
+                response.add_post_render_callback(
+                    lambda rendered: cache.set(key, rendered, timeout)
+                )
+            else:
+                cache.set(key, response, timeout)
+        return response
+
+
+class ConditionalGetMixin:
+    """
+    ETag и Last-Modified для GET-запросов по меткам версий данных.
+    Валидаторы считаются до выборки и сериализации, поэтому ответ 304
+    обходится без запросов к базе. Если в представлении есть поля,
+    зависящие от пользователя, то viewer_scoped = True добавляет
+    в валидаторы метку его избранного, корзины и подписок.
+    """
+
+    cache_scopes = ()
+    viewer_scoped = False
+
+    def get_cache_scopes(self, request):
+        return self.cache_scopes
+
+    def get_validators(self, request):
+        scopes = list(self.get_cache_scopes(request))
+        viewer = None
+        if request.user.is_authenticated:
+            viewer = request.user.id
+            if self.viewer_scoped:
+                scopes.append(user_scope(viewer))
+        versions = get_versions(*scopes)
+        etag = f'"{request_fingerprint(request, versions, viewer)}"'
+        last_modified = None
+        if versions:
+            # Last-Modified точен до секунды: в текущей секунде данные
+            # ещё могут измениться, и If-Modified-Since с той же секундой
+            # получил бы 304 на устаревший ответ. Тогда остаётся ETag.
+            seconds = max(versions) // 10 ** 9
+            if seconds < int(time.time()):
+                last_modified = seconds
+        return etag, last_modified
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.validators = None
+        if request.method in ('GET', 'HEAD'):
+            self.validators = self.get_validators(request)
+            if is_not_modified(request, *self.validators):
+                raise NotModified()
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return Response(status=exc.status_code)
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        validators = getattr(self, 'validators', None)
+        if validators and response.status_code in (200, 304):
+            etag, last_modified = validators
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+            patch_vary_headers(response, ('Accept', 'Authorization'))
+            if request.user.is_authenticated:
+                patch_cache_control(response, private=True, no_cache=True)
+            else:
+                patch_cache_control(response, public=True, no_cache=True)
+        return response
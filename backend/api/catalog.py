@@ -0,0 +1,179 @@
+import fcntl
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from rest_framework.renderers import JSONRenderer
+
+from foodgram.versions import INGREDIENTS, TAGS, get_versions
+from recipes.models import Ingredient, Tag
+
+MAGIC = b'FGCATv1\0'
+# magic, версии тегов и ингредиентов, затем смещения и размеры секций:
+# отсортированные id ингредиентов, JSON тегов, JSON ингредиентов.
+HEADER = struct.Struct('<8sqqQQQQQQ')
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogSnapshot:
+    """
+    Снимок тегов и ингредиентов в файле, отображённом в память.
+    Файл общий для всех воркеров на сервере: страницы лежат в кеше ОС
+    в одном экземпляре, а каждый процесс только отображает их.
+    Поколение снимка — метки версий тегов и ингредиентов; когда они
+    сдвигаются, первый заметивший это процесс пересобирает файл под
+    блокировкой и атомарно подменяет его через os.replace.
+    """
+
+    def __init__(self, path=None):
+        self._path = path
+        self._lock = threading.Lock()
+        # Пара (mmap, заголовок) подменяется целиком. Старое отображение
+        # не закрывается явно: его ещё могут читать другие потоки.
+        self._state = None
+
+    @property
+    def path(self):
+        return self._path or settings.CATALOG_SNAPSHOT_PATH
+
+    @staticmethod
+    def current_generation():
+        return tuple(get_versions(TAGS, INGREDIENTS))
+
+    def _load(self):
+        """ Отображает файл в память, если он есть и не повреждён. """
+
+        try:
+            with open(self.path, 'rb') as file:
+                snapshot = mmap.mmap(
+                    file.fileno(), 0, access=mmap.ACCESS_READ
+                )
+        except (FileNotFoundError, ValueError):
+            return None
+        if len(snapshot) < HEADER.size:
+            return None
+        header = HEADER.unpack_from(snapshot)
+        if header[0] != MAGIC:
+            return None
+        return snapshot, header
+
+    @staticmethod
+    def _generation(state):
+        return state[1][1:3] if state else None
+
+    def build(self, generation):
+        """ Собирает снимок во временный файл и подменяет им старый. """
+
+        ids = array('q', Ingredient.objects.order_by('id').values_list(
+            'id', flat=True
+        ))
+        renderer = JSONRenderer()
+        # Импорт здесь: сериализаторы сами читают снимок.
+        from .serializers import IngredientSerializer, TagSerializer
+        tags = renderer.render(
+            TagSerializer(Tag.objects.all(), many=True).data
+        )
+        ingredients = renderer.render(
+            IngredientSerializer(Ingredient.objects.all(), many=True).data
+        )
+        ids_offset = HEADER.size
+        tags_offset = ids_offset + ids.itemsize * len(ids)
+        ingredients_offset = tags_offset + len(tags)
+        header = HEADER.pack(
+            MAGIC, *generation,
+            ids_offset, len(ids),
+            tags_offset, len(tags),
+            ingredients_offset, len(ingredients)
+        )
+        directory = os.path.dirname(self.path)
+        with tempfile.NamedTemporaryFile(
+            dir=directory, prefix='.catalog-', delete=False
+        ) as file:
+            try:
+                file.write(header)
+                ids.tofile(file)
+                file.write(tags)
+                file.write(ingredients)
+                file.flush()
+                os.fsync(file.fileno())
+            except BaseException:
+                os.unlink(file.name)
+                raise
+        os.replace(file.name, self.path)
+
+    def _refresh(self, generation):
+        state = self._load()
+        if self._generation(state) == generation:
+            return state
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(f'{self.path}.lock', 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            # Пока ждали блокировку, снимок мог пересобрать другой воркер.
+            state = self._load()
+            if self._generation(state) != generation:
+                self.build(generation)
+                return self._load()
+        return state
+
+    def ensure_fresh(self):
+        """
+        Актуальный снимок или None, если файл не удалось собрать:
+        тогда вызывающий код читает данные из базы.
+        """
+
+        generation = self.current_generation()
+        state = self._state
+        if self._generation(state) != generation:
+            with self._lock:
+                state = self._state
+                if self._generation(state) != generation:
+                    try:
+                        state = self._refresh(generation)
+                    except OSError:
+                        logger.exception('Не удалось собрать снимок каталога')
+                        state = None
+                    self._state = state
+        return state
+
+    def _section(self, offset, length):
+        state = self.ensure_fresh()
+        if state is None:
+            return None
+        snapshot, header = state
+        start = header[offset]
+        return bytes(snapshot[start:start + header[length]])
+
+    def tags_json(self):
+        return self._section(5, 6)
+
+    def ingredients_json(self):
+        return self._section(7, 8)
+
+    def missing_ingredients(self, ids):
+        """ Id из ids, которых нет в каталоге, или None без снимка. """
+
+        state = self.ensure_fresh()
+        if state is None:
+            return None
+        snapshot, header = state
+        offset, count = header[3], header[4]
+        known = memoryview(snapshot)[offset:offset + 8 * count].cast('q')
+        try:
+            missing = set()
+            for pk in ids:
+                position = bisect_left(known, pk)
+                if position == count or known[position] != pk:
+                    missing.add(pk)
+            return missing
+        finally:
+            known.release()
+
+
+catalog = CatalogSnapshot()
@@ -0,0 +1,307 @@
+import csv
+import zlib
+from abc import ABC, abstractmethod
+
+from django.conf import settings
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import (FF_NONSYMBOLIC, FF_SYMBOLIC, SUBSETN,
+                                       TTFont, makeToUnicodeCMap)
+
+CHUNK_SIZE = 64 * 1024
+PDF_FONT_NAME = 'ShoppingListFont'
+
+
+class ShoppingListExporter(ABC):
+    """
+    Базовый класс выгрузки списка покупок.
+    Принимает итератор строк с полями name, measurement_unit и amount
+    и отдаёт файл порциями байтов, не собирая его целиком в памяти.
+    """
+
+    extension = None
+    content_type = None
+    title = 'Список покупок'
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    @abstractmethod
+    def __iter__(self):
+        """ Порции байтов файла. """
+
+    @property
+    def filename(self):
+        return f'shopping_list.{self.extension}'
+
+    @staticmethod
+    def format_row(row):
+        return (
+            f"{row['name']} - {row['amount']} {row['measurement_unit']}"
+        )
+
+
+def chunked(parts):
+    """ Склеивает мелкие строки в порции по CHUNK_SIZE байт. """
+
+    buffer = []
+    size = 0
+    for part in parts:
+        data = part.encode()
+        buffer.append(data)
+        size += len(data)
+        if size >= CHUNK_SIZE:
+            yield b''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+class TextExporter(ShoppingListExporter):
+    """ Список покупок простым текстом. """
+
+    extension = 'txt'
+    content_type = 'text/plain; charset=utf-8'
+
+    def lines(self):
+        yield f'{self.title}:\n'
+        for row in self.rows:
+            yield f'{self.format_row(row)}\n'
+
+    def __iter__(self):
+        return chunked(self.lines())
+
+
+class Echo:
+    """ Буфер для csv.writer, возвращающий записанную строку. """
+
+    def write(self, value):
+        return value
+
+
+class CsvExporter(ShoppingListExporter):
+    """ Список покупок в CSV. """
+
+    extension = 'csv'
+    content_type = 'text/csv; charset=utf-8'
+
+    def lines(self):
+        writer = csv.writer(Echo())
+        # BOM нужен, чтобы Excel распознал кириллицу.
+        yield '\ufeff'
+        yield writer.writerow(['Ингредиент', 'Количество', 'Единицы'])
+        for row in self.rows:
+            yield writer.writerow(
+                [row['name'], row['amount'], row['measurement_unit']]
+            )
+
+    def __iter__(self):
+        return chunked(self.lines())
+
+
+class PdfWriter:
+    """
+    PDF, записываемый объект за объектом.
+    Номера объектов, на которые ссылаются страницы (дерево страниц и
+    ресурсы), резервируются заранее, а сами объекты пишутся в конце,
+    поэтому каждую страницу можно отдать, как только она собрана.
+    Методы возвращают байты для отдачи и считают смещения для xref.
+    """
+
+    def __init__(self):
+        self.offsets = {}
+        self.position = 0
+        self.count = 0
+
+    def reserve(self):
+        self.count += 1
+        return self.count
+
+    def write(self, data):
+        self.position += len(data)
+        return data
+
+    def header(self):
+        return self.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+
+    def object(self, number, body):
+        self.offsets[number] = self.position
+        return self.write(b'%d 0 obj\n%s\nendobj\n' % (number, body))
+
+    def stream(self, number, content, entries=b''):
+        content = zlib.compress(content)
+        return self.object(
+            number,
+            b'<< /Length %d /Filter /FlateDecode%s >>\nstream\n%s\nendstream'
+            % (len(content), entries, content)
+        )
+
+    def trailer(self, root, info):
+        start = self.position
+        size = self.count + 1
+        entries = b''.join(
+            b'%010d 00000 n \n' % self.offsets[number]
+            for number in range(1, size)
+        )
+        return self.write(
+            b'xref\n0 %d\n0000000000 65535 f \n%s' % (size, entries)
+            + b'trailer\n<< /Size %d /Root %d 0 R /Info %d 0 R >>\n'
+            % (size, root, info)
+            + b'startxref\n%d\n%%%%EOF\n' % start
+        )
+
+
+def pdf_numbers(values):
+    return b' '.join(b'%g' % value for value in values)
+
+
+def pdf_text_string(text):
+    return b'<%s>' % ('\ufeff' + text).encode('utf-16-be').hex().encode()
+
+
+class PdfExporter(ShoppingListExporter):
+    """
+    Список покупок в PDF со встроенным шрифтом с кириллицей.
+    Документ пишется PdfWriter постранично: страница отдаётся, как
+    только заполнена, а подмножества шрифта с использованными
+    символами — в конце документа. Canvas из reportlab так не умеет:
+    он отдаёт документ только целиком в save(). Подмножества шрифта
+    собираются внутренними функциями reportlab, поэтому его версия
+    закреплена в requirements.txt, а выгрузку разбирает pypdf в
+    tests/test_exporters.py.
+    """
+
+    extension = 'pdf'
+    content_type = 'application/pdf'
+    font_size = 12
+    margin = 20 * mm
+    line_height = 7 * mm
+
+    @staticmethod
+    def register_font():
+        if PDF_FONT_NAME not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(
+                TTFont(PDF_FONT_NAME, settings.SHOPPING_LIST_FONT)
+            )
+        return pdfmetrics.getFont(PDF_FONT_NAME)
+
+    def text(self, x, y, size, text):
+        """ Строка, выведенная подмножествами шрифта F0, F1, ... """
+
+        parts = [b'BT %.2f %.2f Td' % (x, y)]
+        # Номера символов в подмножествах шрифт хранит по ключу
+        # документа; ключом служит сам выгрузчик.
+        for subset, chunk in self.font.splitString(text, self):
+            parts.append(
+                b'/F%d %d Tf <%s> Tj' % (subset, size, chunk.hex().encode())
+            )
+        parts.append(b'ET')
+        return b' '.join(parts)
+
+    def pages(self):
+        """ Содержимое страниц по одной. """
+
+        height = A4[1]
+        lines = [self.text(
+            self.margin, height - self.margin, self.font_size + 4,
+            self.title
+        )]
+        y = height - self.margin - 2 * self.line_height
+        for row in self.rows:
+            if y < self.margin:
+                yield b'\n'.join(lines)
+                lines = []
+                y = height - self.margin
+            lines.append(self.text(
+                self.margin, y, self.font_size, f'• {self.format_row(row)}'
+            ))
+            y -= self.line_height
+        yield b'\n'.join(lines)
+
+    def font_subset(self, pdf, subset, codes):
+        """ Объекты подмножества шрифта: номер шрифта и байты. """
+
+        face = self.font.face
+        name = SUBSETN(subset) + b'+' + face.name + face.subfontNameX
+        font_file, cmap, descriptor, font = (pdf.reserve() for _ in range(4))
+        content = face.makeSubset(codes)
+        flags = face.flags & ~FF_NONSYMBOLIC | FF_SYMBOLIC
+        return font, b''.join([
+            pdf.stream(font_file, content, b' /Length1 %d' % len(content)),
+            pdf.stream(cmap, makeToUnicodeCMap(
+                name.decode('latin-1'), codes
+            ).encode('latin-1')),
+            pdf.object(
+                descriptor,
+                b'<< /Type /FontDescriptor /FontName /%s /Flags %d '
+                b'/FontBBox [%s] /ItalicAngle %g /Ascent %g /Descent %g '
+                b'/CapHeight %g /StemV %g /FontFile2 %d 0 R >>' % (
+                    name, flags, pdf_numbers(face.bbox), face.italicAngle,
+                    face.ascent, face.descent, face.capHeight, face.stemV,
+                    font_file
+                )
+            ),
+            pdf.object(
+                font,
+                b'<< /Type /Font /Subtype /TrueType /BaseFont /%s '
+                b'/FirstChar 0 /LastChar %d /Widths [%s] '
+                b'/FontDescriptor %d 0 R /ToUnicode %d 0 R >>' % (
+                    name, len(codes) - 1,
+                    pdf_numbers(map(face.getCharWidth, codes)),
+                    descriptor, cmap
+                )
+            ),
+        ])
+
+    def __iter__(self):
+        self.font = self.register_font()
+        pdf = PdfWriter()
+        catalog, page_tree, resources, info = (
+            pdf.reserve() for _ in range(4)
+        )
+        try:
+            yield pdf.header()
+            kids = []
+            for content in self.pages():
+                contents, page = pdf.reserve(), pdf.reserve()
+                yield pdf.stream(contents, content) + pdf.object(
+                    page,
+                    b'<< /Type /Page /Parent %d 0 R /Resources %d 0 R '
+                    b'/Contents %d 0 R >>' % (page_tree, resources, contents)
+                )
+                kids.append(b'%d 0 R' % page)
+            fonts = []
+            subsets = self.font.state[self].subsets
+            for subset, codes in enumerate(subsets):
+                font, data = self.font_subset(pdf, subset, codes)
+                fonts.append(b'/F%d %d 0 R' % (subset, font))
+                yield data
+            yield b''.join([
+                pdf.object(
+                    resources, b'<< /Font << %s >> >>' % b' '.join(fonts)
+                ),
+                pdf.object(
+                    page_tree,
+                    b'<< /Type /Pages /Kids [%s] /Count %d '
+                    b'/MediaBox [0 0 %s] >>'
+                    % (b' '.join(kids), len(kids), pdf_numbers(A4))
+                ),
+                pdf.object(
+                    catalog, b'<< /Type /Catalog /Pages %d 0 R >>' % page_tree
+                ),
+                pdf.object(
+                    info, b'<< /Title %s >>' % pdf_text_string(self.title)
+                ),
+                pdf.trailer(catalog, info),
+            ])
+        finally:
+            self.font.state.pop(self, None)
+
+
+EXPORTERS = {
+    exporter.extension: exporter
+    for exporter in (PdfExporter, CsvExporter, TextExporter)
+}
+DEFAULT_EXPORT_FORMAT = PdfExporter.extension
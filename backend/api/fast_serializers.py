@@ -0,0 +1,201 @@
+"""
+Сериализация для чтения без полей DRF.
+
+Списки рецептов, ленты и подписок собираются в словари прямо из строк
+.values() и карт связанных данных, загруженных одним запросом на
+каждую связь. Результат совпадает с RecipeSerializer,
+CustomUserSerializer и ShowSubscriptionsSerializer байт в байт,
+поэтому при изменении этих сериализаторов нужно менять и этот модуль;
+совпадение проверяют тесты tests/test_fast_serializers.py.
+"""
+from collections import defaultdict
+
+from django.core.files.storage import default_storage
+
+from recipes.models import RecipeIngredient, Tag
+from users.models import Subscription, User
+
+from .querysets import (RECIPE_COLUMNS, RECIPE_FLAGS, annotate_is_subscribed,
+                        annotate_recipe_flags, recipe_previews)
+from .serializers import RecipeSerializer
+
+USER_FIELDS = ('id', 'email', 'username', 'first_name', 'last_name')
+TAG_FIELDS = ('id', 'name', 'color', 'slug')
+INGREDIENT_FIELDS = ('id', 'name', 'amount', 'measurement_unit')
+
+# Поля, по которым сортируют пагинаторы; курсору они нужны в строке.
+RECIPE_ORDERING_COLUMNS = ('pub_date', 'favorites_count')
+
+
+def file_url(request, name):
+    """ Ссылка на файл, как её отдаёт ImageField DRF. """
+
+    if not name:
+        return None
+    return request.build_absolute_uri(default_storage.url(name))
+
+
+def variant_urls(request, variants):
+    """ Ссылки на копии картинки, как их отдаёт ImageVariantsField. """
+
+    if variants is None:
+        return None
+    return {
+        size: {
+            image_format: request.build_absolute_uri(
+                default_storage.url(name)
+            )
+            for image_format, name in formats.items()
+        }
+        for size, formats in variants.items()
+    }
+
+
+def subscribed_authors(viewer, author_ids):
+    if viewer.is_anonymous or not author_ids:
+        return set()
+    return set(Subscription.objects.filter(
+        user=viewer, author__in=author_ids
+    ).values_list('author_id', flat=True))
+
+
+def users_by_id(viewer, ids):
+    """ Пользователи в представлении CustomUserSerializer по id. """
+
+    subscribed = subscribed_authors(viewer, ids)
+    return {
+        row['id']: {**row, 'is_subscribed': row['id'] in subscribed}
+        for row in User.objects.filter(pk__in=ids).values(*USER_FIELDS)
+    }
+
+
+def tags_by_recipe(ids):
+    """ Теги рецептов в представлении TagSerializer. """
+
+    tags = defaultdict(list)
+    rows = Tag.objects.filter(tags__in=ids).values_list('tags', *TAG_FIELDS)
+    for recipe_id, *values in rows:
+        tags[recipe_id].append(dict(zip(TAG_FIELDS, values)))
+    return tags
+
+
+def ingredients_by_recipe(ids):
+    """ Ингредиенты рецептов в представлении RecipeIngredientSerializer. """
+
+    ingredients = defaultdict(list)
+    rows = RecipeIngredient.objects.filter(recipe_id__in=ids).values_list(
+        'recipe_id', 'ingredient__id', 'ingredient__name', 'amount',
+        'ingredient__measurement_unit'
+    )
+    for recipe_id, *values in rows:
+        ingredients[recipe_id].append(dict(zip(INGREDIENT_FIELDS, values)))
+    return ingredients
+
+
+class FastRecipeSerializer:
+    """
+    Рецепты в представлении RecipeSerializer.
+    Набор полей разбирается один раз в конструкторе: для каждого поля
+    готовится функция, достающая значение из строки или карты связей,
+    а связи, которых нет среди полей, не загружаются вовсе.
+    """
+
+    def __init__(self, request, fields=None):
+        self.request = request
+        self.fields = (
+            RecipeSerializer.Meta.fields if fields is None else fields
+        )
+        self.flags = [flag for flag in RECIPE_FLAGS if flag in self.fields]
+        self.columns = [
+            column for field, column in RECIPE_COLUMNS.items()
+            if field in self.fields
+        ]
+
+    def rows(self, queryset):
+        """ Строки рецептов: запрошенные колонки, флаги и поля сортировки. """
+
+        queryset = annotate_recipe_flags(
+            queryset, self.request.user, self.flags
+        )
+        return queryset.values(
+            'id', 'author_id', *RECIPE_ORDERING_COLUMNS, *self.columns,
+            *self.flags
+        )
+
+    def getters(self, ids, author_ids):
+        """ Функции, достающие значение каждого поля из строки рецепта. """
+
+        request = self.request
+        getters = {
+            'id': lambda row: row['id'],
+            'name': lambda row: row['name'],
+            'image': lambda row: file_url(request, row['image']),
+            'images': lambda row: variant_urls(
+                request, row['image_variants']
+            ),
+            'text': lambda row: row['text'],
+            'cooking_time': lambda row: row['cooking_time'],
+        }
+        for flag in self.flags:
+            getters[flag] = lambda row, flag=flag: row[flag]
+        if 'tags' in self.fields:
+            tags = tags_by_recipe(ids)
+            getters['tags'] = lambda row: tags.get(row['id'], [])
+        if 'author' in self.fields:
+            authors = users_by_id(request.user, author_ids)
+            getters['author'] = lambda row: authors.get(row['author_id'])
+        if 'ingredients' in self.fields:
+            ingredients = ingredients_by_recipe(ids)
+            getters['ingredients'] = lambda row: ingredients.get(
+                row['id'], []
+            )
+        return [(field, getters[field]) for field in self.fields]
+
+    def serialize(self, rows):
+        rows = list(rows)
+        getters = self.getters(
+            [row['id'] for row in rows],
+            {row['author_id'] for row in rows}
+        )
+        return [
+            {field: get(row) for field, get in getters}
+            for row in rows
+        ]
+
+
+class FastSubscriptionSerializer:
+    """ Авторы из подписок в представлении ShowSubscriptionsSerializer. """
+
+    def __init__(self, request):
+        self.request = request
+
+    def rows(self, queryset):
+        return annotate_is_subscribed(queryset, self.request.user).values(
+            *USER_FIELDS, 'is_subscribed', 'recipes_count'
+        )
+
+    def preview(self, recipe):
+        """ Рецепт в представлении ShowFavoriteSerializer. """
+
+        return {
+            'id': recipe.id,
+            'name': recipe.name,
+            'image': file_url(self.request, recipe.image.name),
+            'images': variant_urls(self.request, recipe.image_variants),
+            'cooking_time': recipe.cooking_time,
+        }
+
+    def serialize(self, rows, recipes_limit=None):
+        rows = list(rows)
+        previews = recipe_previews([row['id'] for row in rows], recipes_limit)
+        return [
+            {
+                **{field: row[field] for field in USER_FIELDS},
+                'is_subscribed': row['is_subscribed'],
+                'recipes': [
+                    self.preview(recipe) for recipe in previews[row['id']]
+                ],
+                'recipes_count': row['recipes_count'],
+            }
+            for row in rows
+        ]
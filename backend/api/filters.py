@@ -1,13 +1,13 @@
 import django_filters
-from rest_framework.filters import SearchFilter
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            TrigramSimilarity)
+from django.db import connection
+from django.db.models import Case, F, FloatField, Q, Value, When
+from rest_framework.filters import OrderingFilter
 
 from recipes.models import Recipe, Tag
 
 
-class IngredientFilter(SearchFilter):
-    search_parameter = 'name'
-
-
 class RecipeFilter(django_filters.FilterSet):
     author = django_filters.CharFilter()
     tags = django_filters.ModelMultipleChoiceFilter(
@@ -17,6 +17,7 @@ class RecipeFilter(django_filters.FilterSet):
     )
     is_favorite = django_filters.BooleanFilter(method='get_favorite')
     is_in_cart = django_filters.BooleanFilter(method='get_is_in_cart')
+    search = django_filters.CharFilter(method='get_search')
 
     class Meta:
         model = Recipe
@@ -24,7 +25,8 @@ class RecipeFilter(django_filters.FilterSet):
             'tags',
             'author',
             'is_favorite',
-            'is_in_cart'
+            'is_in_cart',
+            'search'
         ]
 
     def get_favorite(self, queryset, name, value):
@@ -36,3 +38,48 @@ class RecipeFilter(django_filters.FilterSet):
         if value:
             return queryset.filter(cart__user=self.request.user)
         return queryset
+
+    def get_search(self, queryset, name, value):
+        """
+        Поиск по названию и описанию с сортировкой по релевантности.
+        В PostgreSQL это полнотекстовый поиск по проиндексированному
+        search_vector, дополненный триграммным сходством названия для
+        запросов с опечатками; в остальных СУБД — поиск по подстроке.
+        """
+
+        value = value.strip()
+        if not value:
+            return queryset
+        if connection.vendor != 'postgresql':
+            return queryset.filter(
+                Q(name__icontains=value) | Q(text__icontains=value)
+            ).annotate(rank=Case(
+                When(name__icontains=value, then=Value(1.0)),
+                default=Value(0.5),
+                output_field=FloatField()
+            )).order_by('-rank', '-id')
+        query = SearchQuery(value, config='russian', search_type='websearch')
+        return queryset.filter(
+            Q(search_vector=query) | Q(name__trigram_similar=value)
+        ).annotate(
+            rank=SearchRank(F('search_vector'), query)
+            + TrigramSimilarity('name', value)
+        ).order_by('-rank', '-id')
+
+
+class RecipeOrderingFilter(OrderingFilter):
+    """
+    Сортировка по ?ordering= с id в конце для однозначного порядка.
+    Без параметра порядок не трогается: его задаёт модель или поиск.
+    """
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if ordering and not {'id', '-id'} & set(ordering):
+            return [*ordering, '-id']
+        return ordering
+
+    def filter_queryset(self, request, queryset, view):
+        if self.ordering_param not in request.query_params:
+            return queryset
+        return super().filter_queryset(request, queryset, view)
@@ -0,0 +1,98 @@
+import heapq
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.models import Count
+
+from foodgram.versions import INGREDIENTS, get_versions
+from recipes.models import Ingredient
+
+
+class IngredientPrefixIndex:
+    """
+    Индекс ингредиентов по началу названия в памяти процесса.
+    Названия хранятся отсортированными, поэтому совпадения по префиксу
+    находятся двоичным поиском, а из них выбираются K самых
+    используемых в рецептах ингредиентов.
+    Индекс привязан к метке версии INGREDIENTS, как снимок каталога в
+    api/catalog.py: изменение ингредиентов в любом процессе сдвигает
+    метку, и каждый воркер пересобирает свой индекс. Частота
+    использования меняется и без этого, поэтому индекс ещё и
+    пересобирается раз в INGREDIENT_INDEX_TTL секунд.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (версия ингредиентов, время сборки, ключи, ранги, записи);
+        # кортеж подменяется целиком, поэтому читается без блокировки.
+        self._state = None
+
+    @staticmethod
+    def current_version():
+        return get_versions(INGREDIENTS)[0]
+
+    @staticmethod
+    def is_outdated(state, version):
+        return (
+            state is None
+            or state[0] != version
+            or time.monotonic() - state[1] > settings.INGREDIENT_INDEX_TTL
+        )
+
+    def build(self, version):
+        """
+        Собирает индекс из таблицы ингредиентов.
+        Версия и время сборки берутся до чтения таблицы: если
+        ингредиенты изменятся во время чтения, метка сдвинется, и
+        следующий запрос соберёт индекс заново.
+        """
+
+        built_at = time.monotonic()
+        rows = Ingredient.objects.annotate(
+            usage=Count('recipeingredient')
+        ).values_list('id', 'name', 'measurement_unit', 'usage')
+        entries = sorted(
+            (name.lower(), -usage, pk, name, unit)
+            for pk, name, unit, usage in rows.iterator()
+        )
+        keys = [entry[0] for entry in entries]
+        ranks = [entry[1] for entry in entries]
+        items = [
+            {'id': pk, 'name': name, 'measurement_unit': unit}
+            for _, _, pk, name, unit in entries
+        ]
+        return version, built_at, keys, ranks, items
+
+    def ensure_built(self):
+        version = self.current_version()
+        state = self._state
+        if self.is_outdated(state, version):
+            with self._lock:
+                state = self._state
+                if self.is_outdated(state, version):
+                    state = self._state = self.build(version)
+        return state[2:]
+
+    def warm_up(self):
+        """ Построение индекса при старте процесса, если база доступна. """
+
+        try:
+            self.ensure_built()
+        except DatabaseError:
+            pass
+
+    def search(self, prefix, limit):
+        keys, ranks, items = self.ensure_built()
+        prefix = prefix.lower()
+        start = bisect_left(keys, prefix)
+        end = bisect_left(keys, prefix + '\U0010ffff', start)
+        best = heapq.nsmallest(
+            limit, range(start, end), key=lambda i: (ranks[i], keys[i])
+        )
+        return [items[i] for i in best]
+
+
+ingredient_index = IngredientPrefixIndex()
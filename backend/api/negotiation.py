@@ -0,0 +1,14 @@
+from rest_framework.negotiation import BaseContentNegotiation
+
+
+class IgnoreFormatNegotiation(BaseContentNegotiation):
+    """
+    Параметр ?format= у выгрузок выбирает формат файла,
+    поэтому ответы об ошибках всегда отдаются первым рендерером.
+    """
+
+    def select_parser(self, request, parsers):
+        return parsers[0]
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return (renderers[0], renderers[0].media_type)
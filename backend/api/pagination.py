@@ -1,6 +1,164 @@
-from rest_framework.pagination import PageNumberPagination
+from collections import OrderedDict
+from datetime import datetime
+
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import (Cursor, CursorPagination,
+                                       PageNumberPagination)
+from rest_framework.response import Response
+
+from foodgram.paginators import ApproximateCountPaginator
+from recipes.models import FeedEntry
 
 
 class CustomPagination(PageNumberPagination):
-    page_size_query_parameter = 'limit'
+    """
+    Постраничная навигация с дешёвым подсчётом общего числа.
+    Поле count_is_exact говорит, точное ли значение count.
+    """
+
+    django_paginator_class = ApproximateCountPaginator
+    page_size_query_param = 'limit'
+    page_size = 6
+    max_page_size = 100
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('count', self.page.paginator.count),
+            ('count_is_exact', self.page.paginator.count_is_exact),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+
+class QuerysetOrderingCursorPagination(CursorPagination):
+    """ Курсорная навигация в порядке, заданном ей явно. """
+
+    def get_ordering(self, request, queryset, view):
+        return self.ordering
+
+
+class CursorOrPagePagination(CustomPagination):
+    """
+    Постраничная навигация, а с ?pagination=cursor — курсорная.
+    Курсорная страница выбирается по индексу без COUNT(*) и OFFSET,
+    поэтому далёкие страницы стоят столько же, сколько первая.
+    Курсор идёт в порядке самого queryset (его задают сортировка и
+    поиск) с id для однозначности; если порядок задан полем не из
+    cursor_fields, изменчивым или неуникальным, как релевантность
+    поиска или счётчик избранного, курсор не выдаётся: ответ 400.
+    """
+
+    cursor_query_param = 'cursor'
+    cursor_fields = ('id',)
+
+    def use_cursor(self, request):
+        return (
+            request.query_params.get('pagination') == 'cursor'
+            or self.cursor_query_param in request.query_params
+        )
+
+    def get_cursor_ordering(self, queryset):
+        ordering = list(
+            queryset.query.order_by or queryset.model._meta.ordering
+        )
+        unsupported = [
+            str(field) for field in ordering
+            if not isinstance(field, str)
+            or field.lstrip('-') not in self.cursor_fields
+        ]
+        if unsupported:
+            raise ValidationError({'pagination': (
+                'Курсорная навигация недоступна при сортировке по '
+                f'{", ".join(unsupported)}.'
+            )})
+        if not {'id', '-id'} & set(ordering):
+            ordering.append('-id')
+        return tuple(ordering)
+
+    def get_cursor_paginator(self, queryset):
+        paginator = QuerysetOrderingCursorPagination()
+        paginator.page_size = self.page_size
+        paginator.page_size_query_param = self.page_size_query_param
+        paginator.max_page_size = self.max_page_size
+        paginator.cursor_query_param = self.cursor_query_param
+        paginator.ordering = self.get_cursor_ordering(queryset)
+        return paginator
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        if self.use_cursor(request):
+            self.cursor_paginator = self.get_cursor_paginator(queryset)
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class RecipePagination(CursorOrPagePagination):
+    cursor_fields = ('pub_date', 'id')
+
+
+class SubscriptionPagination(CursorOrPagePagination):
+    pass
+
+
+class FeedPagination(CursorPagination):
+    """
+    Лента читается только курсором: она растёт сверху.
+    Позиция курсора — ключ (pub_date, id) крайнего рецепта страницы;
+    страницу по ней выбирает FeedEntry.objects.page.
+    """
+
     page_size = 6
+    page_size_query_param = 'limit'
+    max_page_size = CustomPagination.max_page_size
+    ordering = ('-pub_date', '-id')
+
+    @staticmethod
+    def encode_position(key):
+        pub_date, pk = key
+        return f'{pub_date.isoformat()}|{pk}'
+
+    def decode_position(self, position):
+        try:
+            pub_date, pk = position.split('|')
+            return datetime.fromisoformat(pub_date), int(pk)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+
+    def cursor_link(self, key, reverse):
+        return self.encode_cursor(Cursor(
+            offset=0, reverse=reverse, position=self.encode_position(key)
+        ))
+
+    def paginate_feed(self, request, user):
+        """ id рецептов страницы ленты в порядке показа. """
+
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        position = reverse = None
+        if cursor is not None and cursor.position is not None:
+            position = self.decode_position(cursor.position)
+            reverse = cursor.reverse
+        keys, has_more = FeedEntry.objects.page(
+            user, self.page_size, position, bool(reverse)
+        )
+        self.next_link = self.previous_link = None
+        if keys and (has_more or reverse):
+            self.next_link = self.cursor_link(keys[-1], False)
+        if keys and (has_more if reverse else position is not None):
+            self.previous_link = self.cursor_link(keys[0], True)
+        return [pk for _, pk in keys]
+
+    def get_next_link(self):
+        return self.next_link
+
+    def get_previous_link(self):
+        return self.previous_link
@@ -0,0 +1,131 @@
+from django.db.models import (BooleanField, Exists, F, OuterRef, Prefetch,
+                              Value, Window)
+from django.db.models.functions import RowNumber
+
+from recipes.models import Favorite, Recipe, RecipeIngredient, ShoppingCart
+from users.models import Subscription, User
+
+
+def annotate_is_subscribed(queryset, user):
+    """ Флаг подписки текущего пользователя на авторов из выборки. """
+
+    if user.is_anonymous:
+        return queryset.annotate(
+            is_subscribed=Value(False, output_field=BooleanField())
+        )
+    return queryset.annotate(is_subscribed=Exists(
+        Subscription.objects.filter(user=user, author=OuterRef('pk'))
+    ))
+
+
+RECIPE_FLAGS = {
+    'is_favorited': Favorite,
+    'is_in_shopping_cart': ShoppingCart,
+}
+
+# Поля сериализатора рецепта, которые читаются из его собственных колонок.
+RECIPE_COLUMNS = {
+    'name': 'name',
+    'image': 'image',
+    'images': 'image_variants',
+    'text': 'text',
+    'cooking_time': 'cooking_time',
+}
+
+
+def annotate_recipe_flags(queryset, user, flags=RECIPE_FLAGS):
+    """ Флаги избранного и корзины текущего пользователя для рецептов. """
+
+    if user.is_anonymous:
+        return queryset.annotate(**{
+            flag: Value(False, output_field=BooleanField())
+            for flag in flags
+        })
+    return queryset.annotate(**{
+        flag: Exists(
+            RECIPE_FLAGS[flag].objects.filter(user=user, recipe=OuterRef('pk'))
+        )
+        for flag in flags
+    })
+
+
+def recipe_prefetches(user, fields=None):
+    """
+    План подгрузки связанных данных рецепта: автор с флагом подписки,
+    теги и ингредиенты вместе с их справочными данными.
+    Если передан fields, подгружается только то, что в нём есть.
+    """
+
+    prefetches = {
+        'author': Prefetch(
+            'author',
+            queryset=annotate_is_subscribed(User.objects.all(), user)
+        ),
+        'tags': Prefetch('tags'),
+        'ingredients': Prefetch(
+            'recipeingredient_set',
+            queryset=RecipeIngredient.objects.select_related('ingredient')
+        ),
+    }
+    return tuple(
+        prefetch for field, prefetch in prefetches.items()
+        if fields is None or field in fields
+    )
+
+
+def with_viewer_state(queryset, user, fields=None):
+    """
+    Выборка рецептов для отображения текущему пользователю.
+    Флаги рецептов вычисляются в том же запросе, что и сами рецепты,
+    а связанные данные подгружаются фиксированным числом запросов
+    независимо от размера страницы. Если передан fields, флаги,
+    подгрузки и колонки вне этого набора не запрашиваются вовсе.
+    """
+
+    if fields is None:
+        flags, deferred = RECIPE_FLAGS, ()
+    else:
+        flags = [flag for flag in RECIPE_FLAGS if flag in fields]
+        deferred = [
+            column for field, column in RECIPE_COLUMNS.items()
+            if field not in fields
+        ]
+    return annotate_recipe_flags(queryset, user, flags).defer(
+        *deferred
+    ).prefetch_related(*recipe_prefetches(user, fields))
+
+
+def recipe_previews(author_ids, limit=None):
+    """
+    Последние рецепты авторов со страницы подписок одним запросом.
+    Рецепты нумеруются ROW_NUMBER() в разрезе автора, и в выборку
+    попадают только первые limit из них.
+    """
+
+    previews = {pk: [] for pk in author_ids}
+    if not previews:
+        return previews
+    ranked = Recipe.objects.filter(author__in=previews).only(
+        'id', 'author', 'name', 'image', 'image_variants', 'cooking_time'
+    ).annotate(preview_rank=Window(
+        expression=RowNumber(),
+        partition_by=[F('author')],
+        order_by=[F('pub_date').desc(), F('id').desc()],
+    ))
+    sql, params = ranked.query.sql_with_params()
+    sql = f'SELECT * FROM ({sql}) AS ranked'
+    if limit is not None:
+        sql += ' WHERE ranked.preview_rank <= %s'
+        params = (*params, limit)
+    sql += ' ORDER BY ranked.preview_rank'
+    for recipe in Recipe.objects.raw(sql, params):
+        previews[recipe.author_id].append(recipe)
+    return previews
+
+
+def attach_recipe_previews(authors, limit=None):
+    """ Проставляет авторам recipe_previews для сериализатора подписок. """
+
+    previews = recipe_previews([author.pk for author in authors], limit)
+    for author in authors:
+        author.recipe_previews = previews[author.pk]
@@ -1,15 +1,100 @@
+import base64
+import binascii
 import re
 
-from django.db.models import Q
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.db import transaction
+from django.db.models import Q, prefetch_related_objects
 from djoser.serializers import UserCreateSerializer, UserSerializer
-from drf_extra_fields.fields import Base64ImageField
+from drf_extra_fields.fields import Base64FieldMixin, Base64ImageField
+from PIL import Image
 from rest_framework import serializers
 from rest_framework.validators import UniqueTogetherValidator
 
+from recipes.images import schedule_image_processing
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                            ShoppingCart, Tag)
+                            ShoppingCart, ShoppingListItem, Tag)
 from users.models import Subscription, User
 
+from .catalog import catalog
+from .querysets import recipe_prefetches
+
+
+class ImageVariantsField(serializers.ReadOnlyField):
+    """ Ссылки на уменьшенные копии картинки рецепта по размерам. """
+
+    def to_representation(self, value):
+        request = self.context.get('request')
+        return {
+            size: {
+                image_format: request.build_absolute_uri(
+                    default_storage.url(name)
+                )
+                for image_format, name in formats.items()
+            }
+            for size, formats in value.items()
+        }
+
+
+class StreamingBase64ImageField(Base64ImageField):
+    """
+    Base64ImageField, декодирующий картинку кусками во временный файл.
+    Декодированная копия не собирается в памяти целиком, а хранилище
+    получает временный файл: FileSystemStorage переносит его на место
+    без копирования, другие хранилища читают его по частям.
+    """
+
+    chunk_size = 64 * 1024
+    base64_marker = ';base64,'
+
+    def to_internal_value(self, data):
+        if data in self.EMPTY_VALUES or not isinstance(data, str):
+            return super().to_internal_value(data)
+        marker = data.find(self.base64_marker, 0, 100)
+        start = 0 if marker == -1 else marker + len(self.base64_marker)
+        file = TemporaryUploadedFile('image', None, 0, None)
+        try:
+            self.decode(data, start, file)
+            file.size = file.tell()
+            file.name = (
+                f'{self.get_file_name(None)}.{self.detect_extension(file)}'
+            )
+            # Мимо Base64FieldMixin: файл уже декодирован.
+            return super(Base64FieldMixin, self).to_internal_value(file)
+        except BaseException:
+            file.close()
+            raise
+
+    def decode(self, data, start, file):
+        tail = ''
+        for offset in range(start, len(data), self.chunk_size):
+            chunk = tail + ''.join(
+                data[offset:offset + self.chunk_size].split()
+            )
+            usable = len(chunk) - len(chunk) % 4
+            try:
+                file.write(base64.b64decode(chunk[:usable], validate=True))
+            except (binascii.Error, ValueError):
+                raise serializers.ValidationError(self.INVALID_FILE_MESSAGE)
+            tail = chunk[usable:]
+        if tail or not file.tell():
+            raise serializers.ValidationError(self.INVALID_FILE_MESSAGE)
+
+    def detect_extension(self, file):
+        file.seek(0)
+        try:
+            image_format = Image.open(file).format
+        except (OSError, ValueError):
+            raise serializers.ValidationError(self.INVALID_FILE_MESSAGE)
+        finally:
+            file.seek(0)
+        extension = 'jpg' if image_format == 'JPEG' else image_format.lower()
+        if extension not in self.ALLOWED_TYPES:
+            raise serializers.ValidationError(self.INVALID_TYPE_MESSAGE)
+        return extension
+
 
 class CustomUserCreateSerializer(UserCreateSerializer):
     """ Сериализатор для регистрации пользователя. """
@@ -42,6 +127,8 @@ class CustomUserSerializer(UserSerializer):
         ]
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
@@ -80,7 +167,65 @@ class IngredientSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'measurement_unit']
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class SparseFieldsMixin:
+    """
+    Выбор полей ответа. Набор полей передаётся в context['fields'],
+    остальные поля удаляются до сериализации, и их методы не вызываются.
+    Именованные наборы полей описываются в Meta.representations.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = self.context.get('fields')
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    @staticmethod
+    def split(query_params, param):
+        return [
+            name.strip()
+            for value in query_params.getlist(param)
+            for name in value.split(',')
+            if name.strip()
+        ]
+
+    @classmethod
+    def select_fields(cls, query_params):
+        """
+        Поля по параметрам ?view=, ?fields= и ?omit= в порядке Meta.fields
+        или None, если запрошено представление целиком.
+        """
+
+        available = cls.Meta.fields
+        representations = getattr(cls.Meta, 'representations', {})
+        view = query_params.get('view')
+        fields = cls.split(query_params, 'fields')
+        omit = cls.split(query_params, 'omit')
+        if not (view or fields or omit):
+            return None
+        errors = {}
+        if view and fields:
+            errors['view'] = 'Укажите либо view, либо fields.'
+        elif view and view not in representations:
+            errors['view'] = (
+                f'Неизвестное представление {view}. '
+                f'Доступны: {", ".join(representations)}.'
+            )
+        for param, names in (('fields', fields), ('omit', omit)):
+            unknown = [name for name in names if name not in available]
+            if unknown:
+                errors[param] = f'Неизвестные поля: {", ".join(unknown)}.'
+        if errors:
+            raise serializers.ValidationError(errors)
+        selected = representations[view] if view else fields or available
+        return [
+            name for name in available
+            if name in selected and name not in omit
+        ]
+
+
+class RecipeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """ Сериализатор просмотра модели Рецепт. """
 
     tags = TagSerializer(many=True)
@@ -90,6 +235,7 @@ class RecipeSerializer(serializers.ModelSerializer):
         method_name='get_is_favorited')
     is_in_shopping_cart = serializers.SerializerMethodField(
         method_name='get_is_in_shopping_cart')
+    images = ImageVariantsField(source='image_variants')
 
     class Meta:
         model = Recipe
@@ -102,15 +248,21 @@ class RecipeSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'images',
             'text',
             'cooking_time'
         ]
+        representations = {
+            'card': ['id', 'name', 'image', 'images', 'cooking_time'],
+        }
 
     def get_ingredients(self, obj):
-        ingredients = RecipeIngredient.objects.filter(recipe=obj)
+        ingredients = obj.recipeingredient_set.all()
         return RecipeIngredientSerializer(ingredients, many=True).data
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
@@ -119,6 +271,8 @@ class RecipeSerializer(serializers.ModelSerializer):
         ).exists()
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
@@ -146,7 +300,7 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
     tags = serializers.PrimaryKeyRelatedField(
         queryset=Tag.objects.all(), many=True
     )
-    image = Base64ImageField()
+    image = StreamingBase64ImageField()
 
     class Meta:
         model = Recipe
@@ -175,15 +329,81 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
                    'ingredient': 'Ингредиенты должны быть уникальными!'
                 })
             list.append(i['id'])
+        ids = {i['id'] for i in data['ingredients']}
+        missing = catalog.missing_ingredients(ids)
+        if missing is None:
+            missing = ids - set(Ingredient.objects.filter(
+                id__in=ids
+            ).values_list('id', flat=True))
+        if missing:
+            raise serializers.ValidationError({
+                'ingredients': 'Ингредиенты не найдены: '
+                + ', '.join(str(pk) for pk in sorted(missing))
+            })
         return data
 
     def create_ingredients(self, ingredients, recipe):
-        for i in ingredients:
-            ingredient = Ingredient.objects.get(id=i['id'])
-            RecipeIngredient.objects.create(
-                ingredient=ingredient, recipe=recipe, amount=i['amount']
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=recipe, ingredient_id=i['id'], amount=i['amount']
             )
+            for i in ingredients
+        )
 
+    def update_ingredients(self, ingredients, recipe):
+        """
+        Приводит состав рецепта к ingredients, затрагивая только
+        изменившиеся строки. Строки пишутся и удаляются без сигналов,
+        а списки покупок меняются одним change_recipe на всю разницу;
+        сигналы RecipeIngredient остаются для правок из админки.
+        """
+
+        current = {
+            item.ingredient_id: item
+            for item in RecipeIngredient.objects.filter(recipe=recipe)
+        }
+        amounts = {i['id']: i['amount'] for i in ingredients}
+        removed = current.keys() - amounts.keys()
+        if removed:
+            rows = RecipeIngredient.objects.filter(
+                recipe=recipe, ingredient_id__in=removed
+            )
+            rows._raw_delete(rows.db)
+        old_amounts, changed = {}, []
+        for ingredient_id, item in current.items():
+            amount = amounts.get(ingredient_id)
+            if amount == item.amount:
+                continue
+            old_amounts[ingredient_id] = item.amount
+            if amount is not None:
+                item.amount = amount
+                changed.append(item)
+        RecipeIngredient.objects.bulk_update(changed, ['amount'])
+        self.create_ingredients(
+            [i for i in ingredients if i['id'] not in current], recipe
+        )
+        ShoppingListItem.objects.change_recipe(
+            recipe,
+            old_amounts,
+            {
+                ingredient_id: amount
+                for ingredient_id, amount in amounts.items()
+                if ingredient_id in old_amounts
+                or ingredient_id not in current
+            }
+        )
+
+    def save(self, **kwargs):
+        # Временный файл картинки закрывается сразу: хранилище его уже
+        # перенесло, а если сохранение не удалось, файл удаляется.
+        try:
+            return super().save(**kwargs)
+        finally:
+            image = self.validated_data.get('image')
+            if image:
+                image.close()
+
+    @transaction.atomic
     def create(self, validated_data):
         """
         Создание рецепта.
@@ -195,40 +415,46 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
         author = self.context.get('request').user
         recipe = Recipe.objects.create(author=author, **validated_data)
         self.create_ingredients(ingredients, recipe)
-        self.create_tags(tags, recipe)
+        recipe.tags.set(tags)
+        schedule_image_processing(recipe)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         """
         Изменение рецепта.
         Доступно только автору.
         """
 
-        RecipeIngredient.objects.filter(recipe=instance).delete()
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
-        self.create_ingredients(ingredients, instance)
-        self.create_tags(tags, instance)
+        self.update_ingredients(ingredients, instance)
+        instance.tags.set(tags)
         instance.name = validated_data.pop('name')
         instance.text = validated_data.pop('text')
         if validated_data.get('image'):
             instance.image = validated_data.pop('image')
+            schedule_image_processing(instance)
         instance.cooking_time = validated_data.pop('cooking_time')
         instance.save()
         return instance
 
     def to_representation(self, instance):
+        request = self.context.get('request')
+        prefetch_related_objects([instance], *recipe_prefetches(request.user))
         return RecipeSerializer(instance, context={
-            'request': self.context.get('request')
+            'request': request
         }).data
 
 
 class ShowFavoriteSerializer(serializers.ModelSerializer):
     """ Сериализатор для отображения избранного. """
 
+    images = ImageVariantsField(source='image_variants')
+
     class Meta:
         model = Recipe
-        fields = ['id', 'name', 'image', 'cooking_time']
+        fields = ['id', 'name', 'image', 'images', 'cooking_time']
 
 
 class ShoppingCartSerializer(serializers.ModelSerializer):
@@ -262,7 +488,7 @@ class ShowSubscriptionsSerializer(serializers.ModelSerializer):
 
     is_subscribed = serializers.SerializerMethodField()
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
+    recipes_count = serializers.ReadOnlyField()
 
     class Meta:
         model = User
@@ -278,6 +504,8 @@ class ShowSubscriptionsSerializer(serializers.ModelSerializer):
         ]
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
@@ -288,16 +516,15 @@ class ShowSubscriptionsSerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         if not request or request.user.is_anonymous:
             return False
-        recipes = Recipe.objects.filter(author=obj)
-        limit = request.query_params.get('recipes_limit')
-        if limit:
-            recipes = recipes[:int(limit)]
+        recipes = getattr(obj, 'recipe_previews', None)
+        if recipes is None:
+            recipes = Recipe.objects.filter(author=obj)
+            limit = request.query_params.get('recipes_limit')
+            if limit:
+                recipes = recipes[:int(limit)]
         return ShowFavoriteSerializer(
             recipes, many=True, context={'request': request}).data
 
-    def get_recipes_count(self, obj):
-        return Recipe.objects.filter(author=obj).count()
-
 
 class SubscriptionSerializer(serializers.ModelSerializer):
     """ Сериализатор подписок. """
@@ -318,6 +545,16 @@ class SubscriptionSerializer(serializers.ModelSerializer):
         }).data
 
 
+class BatchIdsSerializer(serializers.Serializer):
+    """ Список id для пакетных операций. """
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BATCH_MAX_ITEMS
+    )
+
+
 class UserSerializer(serializers.ModelSerializer):
 
     class Meta:
@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from foodgram.versions import (INGREDIENTS, RECIPES, TAGS, USERS,
+                               bump_versions, user_scope)
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            RecipeTag, ShoppingCart, Tag)
+from users.models import Subscription
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+def bump_ingredients_version(sender, **kwargs):
+    bump_versions(INGREDIENTS)
+
+
+@receiver([post_save, post_delete], sender=Tag)
+def bump_tags_version(sender, **kwargs):
+    bump_versions(TAGS)
+
+
+@receiver([post_save, post_delete], sender=Recipe)
+@receiver([post_save, post_delete], sender=RecipeIngredient)
+@receiver([post_save, post_delete], sender=RecipeTag)
+@receiver(m2m_changed, sender=RecipeTag)
+def bump_recipes_version(sender, **kwargs):
+    bump_versions(RECIPES)
+
+
+@receiver([post_save, post_delete], sender=settings.AUTH_USER_MODEL)
+def bump_users_version(sender, **kwargs):
+    bump_versions(USERS)
+
+
+@receiver([post_save, post_delete], sender=Favorite)
+@receiver([post_save, post_delete], sender=ShoppingCart)
+@receiver([post_save, post_delete], sender=Subscription)
+def bump_viewer_version(sender, instance, **kwargs):
+    bump_versions(user_scope(instance.user_id))
@@ -1,11 +1,9 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import (FavoriteView, IngredientViewSet,
-                    RecipeViewSet,
-                    ShoppingCartView, ShowSubscriptionsView,
-                    SubscribeView, TagViewSet, UserViewSet,
-                    download_shopping_cart,
+from . import async_views
+from .views import (FeedView, IngredientViewSet, RecipeViewSet,
+                    ShowSubscriptionsView, TagViewSet, UserViewSet,
                     check_code_and_create_token, registration)
 
 app_name = 'api'
@@ -22,22 +20,22 @@ urlpatterns = [
     path('v1/auth/token/', check_code_and_create_token, name='token'),
     path(
         'recipes/<int:id>/favorite/',
-        FavoriteView.as_view(),
+        async_views.favorite,
         name='favorite'
     ),
     path(
         'recipes/download_shopping_cart/',
-        download_shopping_cart,
+        async_views.download_shopping_cart,
         name='download_shopping_cart'
     ),
     path(
         'recipes/<int:id>/shopping_cart/',
-        ShoppingCartView.as_view(),
+        async_views.shopping_cart,
         name='shopping_cart'
     ),
     path(
         'users/<int:id>/subscribe/',
-        SubscribeView.as_view(),
+        async_views.subscribe,
         name='subscribe'
     ),
     path(
@@ -45,4 +43,24 @@ urlpatterns = [
         ShowSubscriptionsView.as_view(),
         name='subscriptions'
     ),
+    path(
+        'recipes/favorite/batch/',
+        async_views.favorite_batch,
+        name='favorite_batch'
+    ),
+    path(
+        'recipes/shopping_cart/batch/',
+        async_views.shopping_cart_batch,
+        name='shopping_cart_batch'
+    ),
+    path(
+        'users/subscribe/batch/',
+        async_views.subscribe_batch,
+        name='subscribe_batch'
+    ),
+    path(
+        'users/feed/',
+        FeedView.as_view(),
+        name='feed'
+    ),
 ]
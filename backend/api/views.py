@@ -1,34 +1,47 @@
 import uuid
 
-from django.db.models import Sum
+from django.conf import settings
 from django.contrib.auth.tokens import default_token_generator
 from django.core.mail import send_mail
-from django.http import HttpResponse
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Exists, F, OuterRef
+from django.db.models.functions import Greatest
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.functional import cached_property
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters, mixins, permissions, status, viewsets
 from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.exceptions import ValidationError
 from rest_framework.generics import ListAPIView
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.tokens import AccessToken
-from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                            ShoppingCart, Tag)
-from users.models import Subscription, User
 
+from foodgram.versions import (INGREDIENTS, POPULARITY, RECIPES, TAGS, USERS,
+                               bump_versions, user_scope)
+from recipes.models import (Favorite, FeedEntry, Ingredient, Recipe,
+                            ShoppingCart, ShoppingListItem, Tag)
+from users.models import Subscription, User
 
-from .filters import IngredientFilter, RecipeFilter
-from .pagination import CustomPagination
+from .cache import CachedResponseMixin, ConditionalGetMixin
+from .catalog import catalog
+from .exporters import DEFAULT_EXPORT_FORMAT, EXPORTERS
+from .fast_serializers import FastRecipeSerializer, FastSubscriptionSerializer
+from .filters import RecipeFilter, RecipeOrderingFilter
+from .ingredient_index import ingredient_index
+from .negotiation import IgnoreFormatNegotiation
+from .pagination import (CustomPagination, FeedPagination, RecipePagination,
+                         SubscriptionPagination)
 from .permissions import AdminOrSuperuser, IsAuthorOrAdminOrReadOnly
-from .serializers import (CreateRecipeSerializer, FavoriteSerializer,
-                          IngredientSerializer, RecipeSerializer, 
-                          ShoppingCartSerializer,
-                          ShowSubscriptionsSerializer,
+from .querysets import with_viewer_state
+from .serializers import (BatchIdsSerializer, CreateRecipeSerializer,
+                          FavoriteSerializer, IngredientSerializer,
+                          RecipeSerializer, ShoppingCartSerializer,
                           SubscriptionSerializer, TagSerializer,
-                          UserRegSerializer,
-                          UserSerializer,
+                          UserRegSerializer, UserSerializer,
                           UserTokenSerializer)
 
 
@@ -39,28 +52,96 @@ class CustomViewSet(
     pass
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeFieldsMixin:
+    """
+    Выбор полей рецепта параметрами ?fields=, ?omit= и ?view=card.
+    Невыбранные поля не сериализуются, а их флаги и подгрузки
+    не запрашиваются из базы.
+    """
+
+    @cached_property
+    def recipe_fields(self):
+        if self.request.method != 'GET':
+            return None
+        return RecipeSerializer.select_fields(self.request.query_params)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fields'] = self.recipe_fields
+        return context
+
+    def list(self, request, *args, **kwargs):
+        # Списки собираются без полей DRF, см. api/fast_serializers.py.
+        serializer = FastRecipeSerializer(request, self.recipe_fields)
+        queryset = serializer.rows(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serializer.serialize(page))
+        return Response(serializer.serialize(queryset))
+
+
+class RecipeViewSet(
+    RecipeFieldsMixin, CachedResponseMixin, ConditionalGetMixin,
+    viewsets.ModelViewSet
+):
     """ Просмотр/изменение/добавлениеудаление Рецептов. """
 
+    cache_scopes = (RECIPES, TAGS, INGREDIENTS, USERS)
+    viewer_scoped = True
     permission_classes = [IsAuthorOrAdminOrReadOnly]
-    pagination_class = CustomPagination
+    pagination_class = RecipePagination
     queryset = Recipe.objects.all()
-    filter_backends = [DjangoFilterBackend, ]
+    filter_backends = [DjangoFilterBackend, RecipeOrderingFilter]
     filterset_class = RecipeFilter
+    ordering_fields = ('favorites_count', 'pub_date')
+    ordering = ('-pub_date', '-id')
+
+    def get_cache_scopes(self, request):
+        # Порядок по счётчикам меняется с каждым добавлением в избранное.
+        if 'favorites_count' in request.GET.get('ordering', ''):
+            return (*self.cache_scopes, POPULARITY)
+        return self.cache_scopes
+
+    def get_queryset(self):
+        if self.action == 'list':
+            return self.queryset
+        if self.action == 'retrieve':
+            return with_viewer_state(
+                self.queryset, self.request.user, self.recipe_fields
+            )
+        return self.queryset.select_related('author')
 
     def get_serializer_class(self):
         if self.request.method == 'GET':
             return RecipeSerializer
         return CreateRecipeSerializer
 
+    def perform_create(self, serializer):
+        self.save_recipe(serializer)
+
+    def perform_update(self, serializer):
+        self.save_recipe(serializer)
+
+    @staticmethod
+    def save_recipe(serializer):
+        # Ингредиенты проверяются по снимку каталога; если ингредиент
+        # успели удалить, внешний ключ не даст зафиксировать транзакцию.
+        try:
+            serializer.save()
+        except IntegrityError:
+            raise ValidationError({
+                'ingredients': 'Часть ингредиентов больше не существует.'
+            })
+
     def get_serializer_context(self):
         context = super().get_serializer_context()
         context.update({'request': self.request})
         return context
 
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = User.objects.all().order_by('id')
+    cache_scopes = (USERS,)
     serializer_class = UserSerializer
     permission_classes = [AdminOrSuperuser]
     lookup_field = 'username'
@@ -141,32 +222,61 @@ class SubscribeView(APIView):
             context={'request': request}
         )
         if serializer.is_valid():
-            serializer.save()
+            with transaction.atomic():
+                subscription = serializer.save()
+                FeedEntry.objects.backfill(
+                    request.user, [subscription.author]
+                )
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(status=status.HTTP_400_BAD_REQUEST)
 
     def delete(self, request, id):
-        author = get_object_or_404(User, id=id)        
-        subscription = get_object_or_404(Subscription, 
+        author = get_object_or_404(User, id=id)
+        subscription = get_object_or_404(Subscription,
                                          user=request.user, author=author)
-        subscription.delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)        
+        with transaction.atomic():
+            subscription.delete()
+            FeedEntry.objects.prune(request.user, [author])
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 class ShowSubscriptionsView(ListAPIView):
     """ Показать подписки. """
 
     permission_classes = [IsAuthenticated, ]
-    pagination_class = CustomPagination
+    pagination_class = SubscriptionPagination
 
     def get(self, request):
         user = request.user
-        queryset = User.objects.filter(author__user=user)
+        serializer = FastSubscriptionSerializer(request)
+        queryset = serializer.rows(
+            User.objects.filter(author__user=user).order_by('id')
+        )
         page = self.paginate_queryset(queryset)
-        serializer = ShowSubscriptionsSerializer(
-            page, many=True, context={'request': request}
+        limit = request.query_params.get('recipes_limit')
+        return self.get_paginated_response(
+            serializer.serialize(page, int(limit) if limit else None)
         )
-        return self.get_paginated_response(serializer.data)
+
+
+class FeedView(RecipeFieldsMixin, ListAPIView):
+    """ Рецепты авторов, на которых подписан пользователь. """
+
+    permission_classes = [IsAuthenticated, ]
+    pagination_class = FeedPagination
+    serializer_class = RecipeSerializer
+
+    def list(self, request, *args, **kwargs):
+        ids = self.paginator.paginate_feed(request, request.user)
+        serializer = FastRecipeSerializer(request, self.recipe_fields)
+        rows = {
+            row['id']: row
+            for row in serializer.rows(Recipe.objects.filter(id__in=ids))
+        }
+        # Рецепт мог быть удалён между чтением ленты и чтением строк.
+        return self.paginator.get_paginated_response(serializer.serialize(
+            rows[pk] for pk in ids if pk in rows
+        ))
 
 
 class FavoriteView(APIView):
@@ -217,58 +327,278 @@ class ShoppingCartView(APIView):
                 data=data, context={'request': request}
             )
             if serializer.is_valid():
-                serializer.save()
+                with transaction.atomic():
+                    serializer.save()
                 return Response(
                     serializer.data, status=status.HTTP_201_CREATED)
         return Response(status=status.HTTP_400_BAD_REQUEST)
 
     def delete(self, request, id):
         recipe = get_object_or_404(Recipe, id=id)
-        if ShoppingCart.objects.filter(
-           user=request.user, recipe=recipe).exists():
-            ShoppingCart.objects.filter(
-                user=request.user, recipe=recipe
-            ).delete()
+        deleted, _ = ShoppingCart.objects.filter(
+            user=request.user, recipe=recipe
+        ).delete()
+        if deleted:
             return Response(status=status.HTTP_204_NO_CONTENT)
         return Response(status=status.HTTP_400_BAD_REQUEST)
 
 
-@api_view(['GET'])
-def download_shopping_cart(request):
-    ingredient_list = "Cписок покупок:"
-    ingredients = RecipeIngredient.objects.filter(
-        recipe__shopping_cart__user=request.user
-    ).values(
-        'ingredient__name', 'ingredient__measurement_unit'
-    ).annotate(amount=Sum('amount'))
-    for num, i in enumerate(ingredients):
-        ingredient_list += (
-            f"\n{i['ingredient__name']} - "
-            f"{i['amount']} {i['ingredient__measurement_unit']}"
+class BatchRelationView(APIView):
+    """
+    Пакетное добавление (POST) и удаление (DELETE) связей пользователя
+    с объектами: {"ids": [...]} в теле или ?ids=1,2,3.
+    Все id проверяются одним запросом, связи создаются одним INSERT,
+    а в ответе для каждого id указан результат.
+    Связи вставляются одним INSERT и удаляются одним DELETE мимо
+    сигналов моделей, поэтому счётчики, списки покупок и метки версий
+    обновляются для всего пакета сразу в after_add и after_remove.
+    """
+
+    permission_classes = [IsAuthenticated, ]
+    target_model = None
+    relation_model = None
+    target_field = None
+
+    def get_ids(self, request):
+        ids = request.query_params.get('ids')
+        serializer = BatchIdsSerializer(
+            data={'ids': ids.split(',')} if ids else request.data
+        )
+        serializer.is_valid(raise_exception=True)
+        return list(dict.fromkeys(serializer.validated_data['ids']))
+
+    def relations(self, user, lookup, value):
+        return self.relation_model.objects.filter(
+            user=user, **{f'{self.target_field}{lookup}': value}
+        )
+
+    def get_targets(self, user, ids):
+        """ {id: уже связан с пользователем} для существующих объектов. """
+
+        return dict(self.target_model.objects.filter(pk__in=ids).annotate(
+            linked=Exists(self.relations(user, '', OuterRef('pk')))
+        ).values_list('pk', 'linked'))
+
+    def insert_relations(self, user, ids):
+        """
+        Создаёт связи одним INSERT ... ON CONFLICT DO NOTHING RETURNING
+        и возвращает id объектов, связи с которыми вставил именно этот
+        запрос: связи, созданные параллельно другим запросом, в ответ
+        не попадают.
+        """
+
+        meta = self.relation_model._meta
+        table = connection.ops.quote_name(meta.db_table)
+        column = connection.ops.quote_name(
+            meta.get_field(self.target_field).column
+        )
+        values = ', '.join(['(%s, %s)'] * len(ids))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} (user_id, {column}) VALUES {values} '
+                f'ON CONFLICT DO NOTHING RETURNING {column}',
+                [value for pk in ids for value in (user.id, pk)]
+            )
+            return {pk for pk, in cursor.fetchall()}
+
+    def lock_relations(self, user, ids):
+        """ id объектов, связанных с пользователем; связи блокируются. """
+
+        return set(self.relations(user, '__in', ids).select_for_update(
+        ).values_list(f'{self.target_field}_id', flat=True))
+
+    def is_allowed(self, user, pk):
+        return True
+
+    def after_add(self, user, ids):
+        pass
+
+    def after_remove(self, user, ids):
+        pass
+
+    def post(self, request):
+        user = request.user
+        ids = self.get_ids(request)
+        statuses = {}
+        with transaction.atomic():
+            targets = self.get_targets(user, ids)
+            for pk in ids:
+                if pk not in targets:
+                    statuses[pk] = 'not_found'
+                elif not self.is_allowed(user, pk):
+                    statuses[pk] = 'forbidden'
+                elif targets[pk]:
+                    statuses[pk] = 'exists'
+            candidates = [pk for pk in ids if pk not in statuses]
+            added = (
+                self.insert_relations(user, candidates) if candidates
+                else set()
+            )
+            for pk in candidates:
+                statuses[pk] = 'added' if pk in added else 'exists'
+            if added:
+                self.after_add(user, [pk for pk in candidates if pk in added])
+        results = [{'id': pk, 'status': statuses[pk]} for pk in ids]
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+    def delete(self, request):
+        user = request.user
+        ids = self.get_ids(request)
+        results, removed = [], []
+        with transaction.atomic():
+            targets = self.get_targets(user, ids)
+            linked = self.lock_relations(user, ids)
+            for pk in ids:
+                if pk not in targets:
+                    result = 'not_found'
+                elif pk not in linked:
+                    result = 'missing'
+                else:
+                    result = 'removed'
+                    removed.append(pk)
+                results.append({'id': pk, 'status': result})
+            if removed:
+                relations = self.relations(user, '__in', removed)
+                relations._raw_delete(relations.db)
+                self.after_remove(user, removed)
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+
+class FavoriteBatchView(BatchRelationView):
+    """ Пакетное добавление/удаление рецептов из избранного. """
+
+    target_model = Recipe
+    relation_model = Favorite
+    target_field = 'recipe'
+
+    def after_add(self, user, ids):
+        Recipe.objects.change_counter(ids, 'favorites_count', 1)
+        bump_versions(user_scope(user.id), POPULARITY)
+
+    def after_remove(self, user, ids):
+        Recipe.objects.change_counter(ids, 'favorites_count', -1)
+        bump_versions(user_scope(user.id), POPULARITY)
+
+
+class ShoppingCartBatchView(BatchRelationView):
+    """ Пакетное добавление/удаление рецептов из корзины. """
+
+    target_model = Recipe
+    relation_model = ShoppingCart
+    target_field = 'recipe'
+
+    def after_add(self, user, ids):
+        Recipe.objects.change_counter(ids, 'in_carts_count', 1)
+        ShoppingListItem.objects.add_recipes(user.id, ids)
+        bump_versions(user_scope(user.id), POPULARITY)
+
+    def after_remove(self, user, ids):
+        Recipe.objects.change_counter(ids, 'in_carts_count', -1)
+        ShoppingListItem.objects.remove_recipes(user.id, ids)
+        bump_versions(user_scope(user.id), POPULARITY)
+
+
+class SubscribeBatchView(BatchRelationView):
+    """ Пакетная подписка/отписка. """
+
+    target_model = User
+    relation_model = Subscription
+    target_field = 'author'
+
+    def is_allowed(self, user, pk):
+        return pk != user.id
+
+    def after_add(self, user, ids):
+        User.objects.filter(pk__in=ids).update(
+            followers_count=F('followers_count') + 1
+        )
+        FeedEntry.objects.backfill(user, User.objects.filter(pk__in=ids))
+        bump_versions(user_scope(user.id))
+
+    def after_remove(self, user, ids):
+        User.objects.filter(pk__in=ids).update(
+            followers_count=Greatest(F('followers_count') - 1, 0)
+        )
+        FeedEntry.objects.prune(user, ids)
+        bump_versions(user_scope(user.id))
+
+
+class DownloadShoppingCartView(APIView):
+    """ Выгрузка списка покупок в PDF, CSV или TXT (?format=). """
+
+    permission_classes = [IsAuthenticated, ]
+    content_negotiation_class = IgnoreFormatNegotiation
+
+    def get(self, request):
+        export_format = request.query_params.get(
+            'format', DEFAULT_EXPORT_FORMAT
+        )
+        exporter_class = EXPORTERS.get(export_format)
+        if exporter_class is None:
+            return Response(
+                {'format': f'Доступные форматы: {", ".join(EXPORTERS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        rows = ShoppingListItem.objects.filter(user=request.user).values(
+            'amount',
+            name=F('ingredient__name'),
+            measurement_unit=F('ingredient__measurement_unit')
+        ).order_by('name')
+        exporter = exporter_class(rows.iterator(chunk_size=2000))
+        response = StreamingHttpResponse(
+            exporter, content_type=exporter.content_type
         )
-        if num < ingredients.count() - 1:
-            ingredient_list += ', '
-    file = 'shopping_list'
-    response = HttpResponse(ingredient_list, 'Content-Type: application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="{file}.pdf"'
-    return response
+        response['Content-Disposition'] = (
+            f'attachment; filename="{exporter.filename}"'
+        )
+        return response
+
+
+def catalog_response(request, content):
+    """ Готовый JSON из снимка каталога, если клиент ждёт JSON. """
+
+    if content is None or request.accepted_renderer.format != 'json':
+        return None
+    return HttpResponse(content, content_type='application/json')
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(
+    CachedResponseMixin, ConditionalGetMixin, viewsets.ReadOnlyModelViewSet
+):
     """ Отображение тегов. """
 
+    cache_scopes = (TAGS,)
     permission_classes = [AllowAny, ]
     pagination_class = None
     serializer_class = TagSerializer
     queryset = Tag.objects.all()
 
+    def list(self, request, *args, **kwargs):
+        return catalog_response(
+            request, catalog.tags_json()
+        ) or super().list(request, *args, **kwargs)
+
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(
+    CachedResponseMixin, ConditionalGetMixin, viewsets.ReadOnlyModelViewSet
+):
     """ Отображение ингредиентов. """
 
+    cache_scopes = (INGREDIENTS,)
     permission_classes = [AllowAny, ]
     pagination_class = None
     serializer_class = IngredientSerializer
     queryset = Ingredient.objects.all()
-    filter_backends = [IngredientFilter, ]
-    search_fields = ['^name', ]
+
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if not name:
+            return catalog_response(
+                request, catalog.ingredients_json()
+            ) or super().list(request, *args, **kwargs)
+        limit = request.query_params.get('limit', '')
+        if limit.isdigit():
+            limit = min(int(limit), settings.INGREDIENT_SEARCH_MAX_LIMIT)
+        else:
+            limit = settings.INGREDIENT_SEARCH_LIMIT
+        return Response(ingredient_index.search(name, limit))
@@ -0,0 +1,140 @@
+"""
+Кодирование страниц списка рецептов: время и байты на проводе.
+
+Собирает страницу в представлении RecipeSerializer (с длинными
+описаниями и ингредиентами) и сравнивает стандартный JSONRenderer
+с FastJSONRenderer, а затем размер и время сжатия ответа gzip и
+brotli с настройками CompressionMiddleware.
+
+Запуск из каталога backend:
+
+    python benchmarks/json_encoding.py --recipes 6 --text-length 2000
+    python benchmarks/json_encoding.py --recipes 100 --ingredients 30
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from api.renderers import FastJSONRenderer, orjson  # noqa: E402
+from foodgram.middleware import COMPRESSORS  # noqa: E402
+
+WORDS = (
+    'нарезать лук кубиками обжарить на сливочном масле до золотистого '
+    'цвета добавить муку и перемешать влить горячий бульон тонкой '
+    'струйкой постоянно помешивая варить на медленном огне'
+).split()
+
+
+def text(length, seed):
+    words = []
+    size = 0
+    choice = random.Random(seed).choice
+    while size < length:
+        word = choice(WORDS)
+        words.append(word)
+        size += len(word) + 1
+    return ' '.join(words).capitalize() + '.'
+
+
+def image(path):
+    return f'http://foodgram.example/media/recipes/images/{path}'
+
+
+def recipe(number, args):
+    return {
+        'id': number,
+        'tags': [
+            {'id': tag, 'name': f'Тег {tag}', 'color': '#E26C2D',
+             'slug': f'tag{tag}'}
+            for tag in range(1, 3)
+        ],
+        'author': {
+            'id': number % 50, 'email': f'cook{number % 50}@example.com',
+            'username': f'cook{number % 50}', 'first_name': 'Анна',
+            'last_name': 'Поварова', 'is_subscribed': number % 3 == 0,
+        },
+        'ingredients': [
+            {'id': number * 10 + item, 'name': f'ингредиент {item}',
+             'amount': 10 + item, 'measurement_unit': 'г'}
+            for item in range(args.ingredients)
+        ],
+        'is_favorited': number % 2 == 0,
+        'is_in_shopping_cart': number % 5 == 0,
+        'name': f'Рецепт номер {number}',
+        'image': image(f'{number}.jpg'),
+        'images': {
+            size: {
+                'jpeg': image(f'variants/{number}_{size}.jpg'),
+                'webp': image(f'variants/{number}_{size}.webp'),
+            }
+            for size in ('small', 'medium')
+        },
+        'text': text(args.text_length, number),
+        'cooking_time': 5 + number % 60,
+    }
+
+
+def page(args):
+    return {
+        'count': 10000,
+        'count_is_exact': False,
+        'next': 'http://foodgram.example/api/v1/recipes/?page=2',
+        'previous': None,
+        'results': [recipe(number, args) for number in range(args.recipes)],
+    }
+
+
+def measure(func, rounds):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        result = func()
+    return result, (time.perf_counter() - started) / rounds
+
+
+def main(args):
+    data = page(args)
+    print(f'Страница: {args.recipes} рецептов, описание '
+          f'{args.text_length} символов, {args.ingredients} ингредиентов')
+    if orjson is None:
+        print('orjson не установлен: FastJSONRenderer работает '
+              'через стандартный json.')
+    renderers = (
+        ('JSONRenderer', JSONRenderer()),
+        ('FastJSONRenderer', FastJSONRenderer()),
+    )
+    encoded = {}
+    for name, renderer in renderers:
+        content, elapsed = measure(lambda: renderer.render(data), args.rounds)
+        encoded[name] = content
+        print(f'{name:<18} {elapsed * 1000:8.3f} мс  {len(content):>9} байт')
+    if len(set(encoded.values())) != 1:
+        print('ВНИМАНИЕ: рендереры выдали разный JSON.')
+    content = encoded['FastJSONRenderer']
+    for coding, compress in COMPRESSORS.items():
+        compressed, elapsed = measure(lambda: compress(content), args.rounds)
+        print(
+            f'{coding:<18} {elapsed * 1000:8.3f} мс  '
+            f'{len(compressed):>9} байт '
+            f'({len(compressed) / len(content):.0%} исходного)'
+        )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--recipes', type=int, default=6)
+    parser.add_argument('--text-length', type=int, default=2000)
+    parser.add_argument('--ingredients', type=int, default=12)
+    parser.add_argument('--rounds', type=int, default=200)
+    main(parser.parse_args())
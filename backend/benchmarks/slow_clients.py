@@ -0,0 +1,134 @@
+"""
+Нагрузка медленными клиентами на переключатели избранного и корзины.
+
+Каждый клиент отправляет запрос по частям с паузами (как мобильный
+клиент на плохой сети) и переключает свой рецепт в избранном или
+корзине: POST, затем DELETE. Параллельно «быстрый» клиент раз в
+--probe-interval секунд запрашивает список тегов; его задержка
+показывает, сколько ждут все остальные, пока воркеры заняты
+медленными соединениями.
+
+Запуск против WSGI и ASGI для сравнения:
+
+    gunicorn foodgram.wsgi:application -c gunicorn.conf.py
+    gunicorn foodgram.asgi:application -c gunicorn.asgi.conf.py
+    python benchmarks/slow_clients.py --token <JWT> --recipes 1-100
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+
+def parse_range(value):
+    start, _, end = value.partition('-')
+    return list(range(int(start), int(end or start) + 1))
+
+
+async def request(host, port, method, path, headers, delay=0.0, parts=1):
+    """ Запрос по HTTP/1.1, отправленный parts кусками с паузой delay. """
+
+    started = time.monotonic()
+    reader, writer = await asyncio.open_connection(host, port)
+    lines = [f'{method} {path} HTTP/1.1', f'Host: {host}:{port}']
+    lines += [f'{name}: {value}' for name, value in headers.items()]
+    lines += ['Content-Length: 0', 'Connection: close', '', '']
+    payload = '\r\n'.join(lines).encode()
+    step = max(len(payload) // parts, 1)
+    for offset in range(0, len(payload), step):
+        writer.write(payload[offset:offset + step])
+        await writer.drain()
+        if delay and offset + step < len(payload):
+            await asyncio.sleep(delay)
+    status_line = await reader.readline()
+    await reader.read()
+    writer.close()
+    status = int(status_line.split()[1]) if status_line else 0
+    return status, time.monotonic() - started
+
+
+async def slow_client(args, recipe_id, statuses, latencies):
+    headers = {'Authorization': f'Bearer {args.token}'}
+    path = f'/api/recipes/{recipe_id}/{args.endpoint}/'
+    for _ in range(args.rounds):
+        for method in ('POST', 'DELETE'):
+            status, elapsed = await request(
+                args.host, args.port, method, path, headers,
+                delay=args.delay, parts=args.parts
+            )
+            statuses[status] += 1
+            latencies.append(elapsed)
+
+
+async def probe(args, latencies, stop):
+    while not stop.is_set():
+        _, elapsed = await request(
+            args.host, args.port, 'GET', '/api/v1/tags/', {}
+        )
+        latencies.append(elapsed)
+        await asyncio.sleep(args.probe_interval)
+
+
+def percentile(values, share):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(len(values) * share), len(values) - 1)]
+
+
+async def main(args):
+    statuses = Counter()
+    latencies = []
+    probe_latencies = []
+    stop = asyncio.Event()
+    recipes = parse_range(args.recipes)
+    prober = asyncio.create_task(probe(args, probe_latencies, stop))
+    started = time.monotonic()
+    await asyncio.gather(*(
+        slow_client(args, recipes[number % len(recipes)], statuses, latencies)
+        for number in range(args.clients)
+    ))
+    elapsed = time.monotonic() - started
+    stop.set()
+    await prober
+    total = sum(statuses.values())
+    print(f'Запросов: {total} за {elapsed:.2f} с ({total / elapsed:.1f}/с)')
+    print('Статусы:', dict(statuses))
+    print(
+        f'Медленные клиенты: p50 {percentile(latencies, 0.5):.3f} с, '
+        f'p95 {percentile(latencies, 0.95):.3f} с'
+    )
+    if probe_latencies:
+        print(
+            f'Быстрый клиент: среднее '
+            f'{statistics.mean(probe_latencies):.3f} с, '
+            f'p95 {percentile(probe_latencies, 0.95):.3f} с, '
+            f'максимум {max(probe_latencies):.3f} с'
+        )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--token', required=True, help='JWT-токен.')
+    parser.add_argument(
+        '--recipes', default='1-50', help='Диапазон id рецептов, 1-50.'
+    )
+    parser.add_argument(
+        '--endpoint', choices=['favorite', 'shopping_cart'],
+        default='favorite'
+    )
+    parser.add_argument('--clients', type=int, default=100)
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument(
+        '--delay', type=float, default=0.2,
+        help='Пауза между кусками запроса, с.'
+    )
+    parser.add_argument('--parts', type=int, default=4)
+    parser.add_argument('--probe-interval', type=float, default=0.1)
+    args = parser.parse_args()
+    url = urlsplit(args.url)
+    args.host, args.port = url.hostname, url.port or 80
+    asyncio.run(main(args))
@@ -0,0 +1,12 @@
+from django.contrib import admin
+
+from foodgram.paginators import ApproximateCountPaginator
+from foodgram.settings import EMPTY
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """ Список без точного COUNT(*) по всей таблице. """
+
+    paginator = ApproximateCountPaginator
+    show_full_result_count = False
+    empty_value_display = EMPTY
@@ -1,7 +1,14 @@
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+
+from foodgram.handlers import StreamingASGIHandler
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
 
-application = get_asgi_application()
+django.setup(set_prefix=False)
+application = StreamingASGIHandler()
+
+from api.ingredient_index import ingredient_index  # noqa: E402
+
+ingredient_index.warm_up()
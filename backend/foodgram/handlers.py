@@ -0,0 +1,113 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.db import close_old_connections
+
+# Сколько готовых порций потокового ответа может ждать отправки.
+STREAM_QUEUE_SIZE = 4
+
+_finished = object()
+
+
+class StreamingASGIHandler(ASGIHandler):
+    """
+    ASGIHandler, не блокирующий цикл событий потоковыми ответами.
+    Django 3.2 перебирает streaming_content прямо в цикле событий, а
+    генераторы выгрузок ходят в базу. Здесь генератор целиком
+    выполняется в одном потоке пула, а порции уходят клиенту по мере
+    готовности через короткую очередь, не собираясь в файл или память.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.stream_executor = ThreadPoolExecutor(
+            max_workers=settings.STREAMING_RESPONSE_WORKERS,
+            thread_name_prefix='asgi-streams'
+        )
+
+    @staticmethod
+    def response_headers(response):
+        headers = [
+            (
+                header.encode('ascii') if isinstance(header, str) else header,
+                value.encode('latin1') if isinstance(value, str) else value,
+            )
+            for header, value in response.items()
+        ]
+        headers += [
+            (b'Set-Cookie', cookie.output(header='').encode('ascii').strip())
+            for cookie in response.cookies.values()
+        ]
+        return headers
+
+    async def send_response(self, response, send):
+        if not response.streaming:
+            await super().send_response(response, send)
+            return
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': self.response_headers(response),
+        })
+        async for part in self.stream(response):
+            for chunk, _ in self.chunk_bytes(part):
+                await send({
+                    'type': 'http.response.body',
+                    'body': chunk,
+                    'more_body': True,
+                })
+        await send({'type': 'http.response.body'})
+
+    async def stream(self, response):
+        """
+        Порции ответа из потока пула. Если клиент отключился и порции
+        больше не забираются, поток бросает генератор и закрывает ответ.
+        """
+
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        # Очередь ограничена семафором: поток ждёт на нём, а не в цикле
+        # событий, и не оставляет там корутин, если клиент отключился.
+        slots = threading.Semaphore(STREAM_QUEUE_SIZE)
+        stopped = threading.Event()
+
+        def put(item):
+            while not stopped.is_set():
+                if not slots.acquire(timeout=1):
+                    continue
+                try:
+                    loop.call_soon_threadsafe(queue.put_nowait, item)
+                except RuntimeError:
+                    # Цикл событий уже закрыт.
+                    stopped.set()
+                return
+
+        def produce():
+            close_old_connections()
+            try:
+                for part in response:
+                    if stopped.is_set():
+                        break
+                    put(part)
+            except BaseException as error:
+                put(error)
+            finally:
+                response.close()
+                close_old_connections()
+                put(_finished)
+
+        loop.run_in_executor(self.stream_executor, produce)
+        try:
+            while True:
+                item = await queue.get()
+                slots.release()
+                if item is _finished:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            stopped.set()
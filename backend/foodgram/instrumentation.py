@@ -0,0 +1,95 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from .slow_queries import capture_slow_queries
+
+_stats = ContextVar('request_stats', default=None)
+
+
+class RequestStats:
+    """
+    Счётчики одного запроса: число запросов к базе и длительности
+    этапов в секундах. Объект лежит в ContextVar, поэтому его видят и
+    потоки, в которых асинхронный обработчик выполняет синхронный код.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view_started = None
+        self.view = None
+        self.queries = 0
+        self.durations = {'db': 0.0}
+
+    def add(self, stage, seconds):
+        self.durations[stage] = self.durations.get(stage, 0.0) + seconds
+
+
+def current_stats():
+    return _stats.get()
+
+
+@contextmanager
+def collect():
+    """ Собирает статистику запросов к базе и этапов в RequestStats. """
+
+    stats = RequestStats()
+    token = _stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _stats.reset(token)
+
+
+@contextmanager
+def measure(stage):
+    """ Добавляет длительность блока к этапу текущего запроса. """
+
+    stats = _stats.get()
+    if stats is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.add(stage, time.perf_counter() - started)
+
+
+def count_queries(execute, sql, params, many, context):
+    stats = _stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.durations['db'] += time.perf_counter() - started
+
+
+def query_wrappers():
+    wrappers = [count_queries]
+    if settings.SLOW_QUERY_LOG:
+        wrappers.insert(0, capture_slow_queries)
+    return wrappers
+
+
+def install_query_wrappers(sender, connection, **kwargs):
+    # Соединения свои у каждого потока, поэтому обёртки ставятся
+    # при подключении; повторные подключения их не дублируют.
+    for wrapper in reversed(query_wrappers()):
+        if wrapper not in connection.execute_wrappers:
+            connection.execute_wrappers.insert(0, wrapper)
+
+
+connection_created.connect(
+    install_query_wrappers, dispatch_uid='foodgram.query_wrappers'
+)
+# Соединения текущего потока могли открыться до импорта модуля.
+for existing in connections.all():
+    install_query_wrappers(None, existing)
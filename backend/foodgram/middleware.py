@@ -0,0 +1,193 @@
+import asyncio
+import json
+import logging
+import re
+import time
+from gzip import GzipFile
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+from .instrumentation import collect, current_stats, measure
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger('foodgram.requests')
+
+
+def gzip_compress(content):
+    buffer = BytesIO()
+    with GzipFile(
+        mode='wb', fileobj=buffer, mtime=0,
+        compresslevel=settings.COMPRESSION_GZIP_LEVEL
+    ) as file:
+        file.write(content)
+    return buffer.getvalue()
+
+
+def brotli_compress(content):
+    return brotli.compress(
+        content,
+        mode=brotli.MODE_TEXT,
+        quality=settings.COMPRESSION_BROTLI_QUALITY
+    )
+
+
+# Кодировки в порядке предпочтения при равном весе у клиента.
+COMPRESSORS = {'gzip': gzip_compress}
+if brotli is not None:
+    COMPRESSORS = {'br': brotli_compress, **COMPRESSORS}
+
+
+def accepted_encodings(header):
+    """ Веса кодировок из заголовка Accept-Encoding. """
+
+    weights = {}
+    for item in header.split(','):
+        coding, _, params = item.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        weight = 1.0
+        match = re.search(r'q=([0-9.]+)', params)
+        if match:
+            try:
+                weight = float(match.group(1))
+            except ValueError:
+                weight = 0.0
+        weights[coding] = weight
+    return weights
+
+
+def choose_encoding(header):
+    """ Кодировка с наибольшим весом из поддерживаемых или None. """
+
+    weights = accepted_encodings(header)
+    best, best_weight = None, 0.0
+    for coding in COMPRESSORS:
+        weight = weights.get(coding, weights.get('*', 0.0))
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Сжатие ответов brotli или gzip по Accept-Encoding клиента.
+    Ответы меньше COMPRESSION_MIN_SIZE байт не сжимаются: выигрыш
+    меньше затрат. Потоковые ответы (выгрузки списка покупок) отдаются
+    как есть. ETag, как и в GZipMiddleware, становится слабым.
+    """
+
+    def process_response(self, request, response):
+        if (
+            response.streaming
+            or response.has_header('Content-Encoding')
+            or len(response.content) < settings.COMPRESSION_MIN_SIZE
+        ):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(
+            request.META.get('HTTP_ACCEPT_ENCODING', '')
+        )
+        if encoding is None:
+            return response
+        with measure('compress'):
+            compressed = COMPRESSORS[encoding](response.content)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        if response.has_header('ETag'):
+            response['ETag'] = re.sub(r'^"', 'W/"', response['ETag'])
+        response['Content-Encoding'] = encoding
+        return response
+
+
+class RequestTimingMiddleware(MiddlewareMixin):
+    """
+    Число запросов к базе и время этапов обработки запроса.
+    Итог отдаётся заголовком Server-Timing и строкой лога
+    foodgram.requests в JSON; запросы сверх REQUEST_QUERY_BUDGET
+    запросов к базе или REQUEST_TIME_BUDGET_MS миллисекунд пишутся
+    с уровнем WARNING. Время view — от вызова представления до ответа
+    за вычетом кодирования ответа в JSON (serialize) и сжатия
+    (compress), которые считаются отдельно.
+    """
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_TIMING:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.acall(request)
+        with collect() as stats:
+            response = self.get_response(request)
+            self.report(request, response, stats)
+        return response
+
+    async def acall(self, request):
+        with collect() as stats:
+            response = await self.get_response(request)
+            self.report(request, response, stats)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        stats = current_stats()
+        if stats is not None:
+            stats.view_started = time.perf_counter()
+            stats.view = getattr(
+                view_func, '__qualname__', type(view_func).__qualname__
+            )
+
+    @staticmethod
+    def milliseconds(seconds):
+        return round(seconds * 1000, 2)
+
+    def report(self, request, response, stats):
+        finished = time.perf_counter()
+        durations = dict(stats.durations)
+        if stats.view_started is not None:
+            durations['view'] = max(
+                finished - stats.view_started
+                - durations.get('serialize', 0.0)
+                - durations.get('compress', 0.0),
+                0.0
+            )
+        durations['total'] = finished - stats.started
+        timings = {
+            stage: self.milliseconds(seconds)
+            for stage, seconds in durations.items()
+        }
+        response['Server-Timing'] = ', '.join(
+            f'{stage};dur={duration}' + (
+                f';desc="{stats.queries} queries"' if stage == 'db' else ''
+            )
+            for stage, duration in timings.items()
+        )
+        over_budget = []
+        if stats.queries > settings.REQUEST_QUERY_BUDGET:
+            over_budget.append('queries')
+        if timings['total'] > settings.REQUEST_TIME_BUDGET_MS:
+            over_budget.append('time')
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': stats.queries,
+            **{f'{stage}_ms': value for stage, value in timings.items()},
+            'over_budget': over_budget,
+        }
+        logger.log(
+            logging.WARNING if over_budget else logging.INFO,
+            json.dumps(record, ensure_ascii=False),
+            extra={'timing': record}
+        )
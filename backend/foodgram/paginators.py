@@ -0,0 +1,120 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+
+COUNT_CACHE_PREFIX = 'pagination-count'
+
+
+class ApproximatePage(Page):
+    """ Страница, знающая о следующей без точного общего числа строк. """
+
+    def __init__(self, object_list, number, paginator, has_more=None):
+        super().__init__(object_list, number, paginator)
+        self.has_more = has_more
+
+    def has_next(self):
+        if self.has_more is None:
+            return super().has_next()
+        return self.has_more
+
+
+class ApproximateCountPaginator(Paginator):
+    """
+    Пагинатор без COUNT(*) по всей выборке.
+    Небольшие выборки считаются точно с LIMIT cap + 1. Для больших
+    берётся оценка планировщика PostgreSQL, если выборка не
+    отфильтрована, иначе — число из кеша по тексту запроса.
+    Если число приблизительное, номер страницы сверху не проверяется,
+    а наличие следующей страницы определяется по лишней строке.
+    """
+
+    def __init__(self, *args, cap=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cap = settings.PAGINATION_COUNT_CAP if cap is None else cap
+
+    @cached_property
+    def counted(self):
+        queryset = self.object_list
+        if not hasattr(queryset, 'query'):
+            return super().count, True
+        queryset = queryset.order_by().values('pk')
+        capped = queryset[:self.cap + 1].count()
+        if capped <= self.cap:
+            return capped, True
+        estimate = self.estimate(queryset)
+        if estimate is not None:
+            return max(estimate, capped), False
+        return self.cached_count(queryset), False
+
+    @property
+    def count(self):
+        return self.counted[0]
+
+    @property
+    def count_is_exact(self):
+        return self.counted[1]
+
+    @staticmethod
+    def estimate(queryset):
+        """ Оценка числа строк таблицы по статистике PostgreSQL. """
+
+        connection = connections[queryset.db]
+        query = queryset.query
+        if connection.vendor != 'postgresql' or query.where or query.distinct:
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class '
+                'WHERE oid = %s::regclass',
+                [queryset.model._meta.db_table]
+            )
+            row = cursor.fetchone()
+        # Таблица без собранной статистики даёт -1.
+        if row is None or row[0] < 0:
+            return None
+        return row[0]
+
+    @staticmethod
+    def cached_count(queryset):
+        sql, params = queryset.query.sql_with_params()
+        digest = hashlib.md5(f'{sql}{params!r}'.encode()).hexdigest()
+        key = f'{COUNT_CACHE_PREFIX}:{digest}'
+        count = cache.get(key)
+        if count is None:
+            count = queryset.count()
+            cache.set(key, count, settings.PAGINATION_COUNT_CACHE_TIMEOUT)
+        return count
+
+    def validate_number(self, number):
+        if self.count_is_exact:
+            return super().validate_number(number)
+        try:
+            if isinstance(number, float) and not number.is_integer():
+                raise ValueError
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(_('That page number is not an integer'))
+        if number < 1:
+            raise EmptyPage(_('That page number is less than 1'))
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if self.count_is_exact:
+            return super().page(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage(_('That page contains no results'))
+        return self._get_page(
+            rows[:self.per_page], number, self,
+            has_more=len(rows) > self.per_page
+        )
+
+    def _get_page(self, *args, **kwargs):
+        return ApproximatePage(*args, **kwargs)
@@ -25,6 +25,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'users',
     'recipes',
     'api',
@@ -37,7 +38,9 @@ INSTALLED_APPS = [
 AUTH_USER_MODEL = 'users.User'
 
 MIDDLEWARE = [
+    'foodgram.middleware.RequestTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'foodgram.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -125,13 +128,152 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+INGREDIENT_INDEX_TTL = int(os.getenv('INGREDIENT_INDEX_TTL', 300))
+INGREDIENT_SEARCH_LIMIT = int(os.getenv('INGREDIENT_SEARCH_LIMIT', 20))
+INGREDIENT_SEARCH_MAX_LIMIT = 100
+
+# Размеры уменьшенных копий картинок рецептов: карточка и страница.
+RECIPE_IMAGE_SIZES = {
+    'small': (360, 240),
+    'medium': (720, 480),
+}
+RECIPE_IMAGE_WORKERS = int(os.getenv('RECIPE_IMAGE_WORKERS', 2))
+
+# Потоки для синхронной части асинхронных представлений; у каждого
+# потока своё соединение с базой.
+ASYNC_VIEW_WORKERS = int(os.getenv('ASYNC_VIEW_WORKERS', 8))
+# Потоки, в которых под ASGI перебираются потоковые ответы (выгрузки).
+STREAMING_RESPONSE_WORKERS = int(os.getenv('STREAMING_RESPONSE_WORKERS', 4))
+
+CATALOG_DATA_DIR = os.getenv(
+    'CATALOG_DATA_DIR', os.path.join(BASE_DIR.parent, 'data')
+)
+
+SHOPPING_LIST_FONT = os.getenv(
+    'SHOPPING_LIST_FONT',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
+# Общий для всех процессов кеш: метки версий и ответы API.
+# Локальная память (locmem) подходит только для одного процесса.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.filebased.FileBasedCache'
+        ),
+        'LOCATION': os.getenv(
+            'CACHE_LOCATION', os.path.join(BASE_DIR, 'cache')
+        ),
+    }
+}
+API_CACHE_TIMEOUT = int(os.getenv('API_CACHE_TIMEOUT', 600))
+
+# Файл снимка тегов и ингредиентов, общий для воркеров одного сервера.
+CATALOG_SNAPSHOT_PATH = os.getenv(
+    'CATALOG_SNAPSHOT_PATH',
+    os.path.join(BASE_DIR, 'cache', 'catalog.snapshot')
+)
+
+# Лента подписок: новые рецепты раскладываются подписчикам пачками
+# по FEED_FANOUT_BATCH_SIZE, если у автора не больше
+# FEED_FANOUT_THRESHOLD подписчиков; рецепты более популярных авторов
+# лента читает напрямую. При подписке в ленту попадают последние
+# FEED_BACKFILL_LIMIT рецептов автора.
+FEED_FANOUT_THRESHOLD = int(os.getenv('FEED_FANOUT_THRESHOLD', 10000))
+FEED_FANOUT_BATCH_SIZE = 1000
+FEED_BACKFILL_LIMIT = 100
+
+# Сколько id можно передать в одном пакетном запросе.
+BATCH_MAX_ITEMS = 100
+
+# До этого числа строк списки считаются точно, дальше — приблизительно.
+PAGINATION_COUNT_CAP = int(os.getenv('PAGINATION_COUNT_CAP', 1000))
+PAGINATION_COUNT_CACHE_TIMEOUT = int(
+    os.getenv('PAGINATION_COUNT_CACHE_TIMEOUT', 300)
+)
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 5,
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+}
+
+# Ответы от COMPRESSION_MIN_SIZE байт сжимаются brotli (если пакет
+# установлен) или gzip, смотря что принимает клиент.
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', 1024))
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_BROTLI_QUALITY = 5
+
+# Число запросов к базе и время этапов каждого запроса: заголовок
+# Server-Timing и лог foodgram.requests. Запросы сверх бюджета
+# пишутся в лог с уровнем WARNING.
+REQUEST_TIMING = os.getenv('REQUEST_TIMING', 'true').lower() == 'true'
+REQUEST_QUERY_BUDGET = int(os.getenv('REQUEST_QUERY_BUDGET', 30))
+REQUEST_TIME_BUDGET_MS = int(os.getenv('REQUEST_TIME_BUDGET_MS', 500))
+
+# Запросы к базе дольше SLOW_QUERY_THRESHOLD_MS пишутся с местом вызова
+# и планом (в PostgreSQL) в SLOW_QUERY_LOG_PATH; план одного и того же
+# запроса снимается не чаще раза в SLOW_QUERY_EXPLAIN_INTERVAL секунд.
+# Сводка: python manage.py slow_query_report.
+SLOW_QUERY_LOG = os.getenv('SLOW_QUERY_LOG', 'false').lower() == 'true'
+SLOW_QUERY_THRESHOLD_MS = int(os.getenv('SLOW_QUERY_THRESHOLD_MS', 200))
+SLOW_QUERY_EXPLAIN_INTERVAL = 60
+SLOW_QUERY_LOG_PATH = os.getenv(
+    'SLOW_QUERY_LOG_PATH', os.path.join(BASE_DIR, 'slow_queries.log')
+)
+SLOW_QUERY_LOG_MAX_BYTES = 10 * 1024 * 1024
+SLOW_QUERY_LOG_BACKUPS = 5
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'plain': {
+            'format': '%(asctime)s %(levelname)s %(name)s %(message)s',
+        },
+    },
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'plain',
+        },
+    },
+    'loggers': {
+        'foodgram.requests': {
+            'handlers': ['console'],
+            'level': os.getenv('REQUEST_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
 }
+if SLOW_QUERY_LOG:
+    LOGGING['formatters']['message'] = {'format': '%(message)s'}
+    LOGGING['handlers']['slow_queries'] = {
+        'class': 'logging.handlers.RotatingFileHandler',
+        'filename': SLOW_QUERY_LOG_PATH,
+        'maxBytes': SLOW_QUERY_LOG_MAX_BYTES,
+        'backupCount': SLOW_QUERY_LOG_BACKUPS,
+        'encoding': 'utf-8',
+        'delay': True,
+        'formatter': 'message',
+    }
+    LOGGING['loggers']['foodgram.slow_queries'] = {
+        'handlers': ['slow_queries'],
+        'level': 'WARNING',
+        'propagate': False,
+    }
 
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
@@ -0,0 +1,151 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from rest_framework.serializers import BaseSerializer, ListSerializer
+
+logger = logging.getLogger('foodgram.slow_queries')
+
+EXPLAINABLE = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE')
+
+_local = threading.local()
+_explained = {}
+
+
+def normalize_sql(sql):
+    """ SQL без значений: литералы и параметры заменены на ?. """
+
+    sql = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    sql = re.sub(r'\b\d+(?:\.\d+)?\b', '?', sql)
+    sql = sql.replace('%s', '?')
+    sql = re.sub(r'\(\s*\?(?:\s*,\s*\?)+\s*\)', '(?, ...)', sql)
+    return re.sub(r'\s+', ' ', sql).strip()
+
+
+def fingerprint(normalized):
+    return hashlib.md5(normalized.encode()).hexdigest()[:12]
+
+
+def query_origin():
+    """
+    Строка кода проекта, из которой выполнен запрос, и сериализатор,
+    если запрос сделан во время сериализации.
+    """
+
+    project = os.path.join(str(settings.BASE_DIR), '')
+    origin = serializer = None
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if (
+            origin is None
+            and filename.startswith(project)
+            and 'site-packages' not in filename
+            and filename != __file__
+        ):
+            origin = (
+                f'{os.path.relpath(filename, project)}:{frame.f_lineno} '
+                f'in {frame.f_code.co_name}'
+            )
+        instance = frame.f_locals.get('self')
+        if (
+            serializer is None
+            and isinstance(instance, BaseSerializer)
+            and not isinstance(instance, ListSerializer)
+        ):
+            serializer = type(instance).__name__
+        frame = frame.f_back
+    return origin, serializer
+
+
+def should_explain(key):
+    now = time.monotonic()
+    last = _explained.get(key)
+    interval = settings.SLOW_QUERY_EXPLAIN_INTERVAL
+    if last is not None and now - last < interval:
+        return False
+    _explained[key] = now
+    return True
+
+
+def explain(connection, sql, params):
+    """
+    План запроса в PostgreSQL без выполнения самого запроса.
+    Используется сырой курсор драйвера, мимо обёрток Django; внутри
+    транзакции EXPLAIN обёрнут в точку сохранения, чтобы ошибка
+    не прервала транзакцию приложения.
+    """
+
+    in_transaction = connection.in_atomic_block
+    with connection.connection.cursor() as cursor:
+        if in_transaction:
+            cursor.execute('SAVEPOINT slow_query_explain')
+        try:
+            cursor.execute(f'EXPLAIN (ANALYZE off) {sql}', params)
+            plan = '\n'.join(row[0] for row in cursor.fetchall())
+        except Exception as error:
+            if in_transaction:
+                cursor.execute('ROLLBACK TO SAVEPOINT slow_query_explain')
+            return f'EXPLAIN не удался: {error}'
+        if in_transaction:
+            cursor.execute('RELEASE SAVEPOINT slow_query_explain')
+    return plan
+
+
+def capture_slow_queries(execute, sql, params, many, context):
+    """
+    Обёртка выполнения запросов: запросы дольше
+    SLOW_QUERY_THRESHOLD_MS пишутся в лог foodgram.slow_queries
+    вместе с местом вызова и планом.
+    """
+
+    if getattr(_local, 'capturing', False):
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = (time.perf_counter() - started) * 1000
+        if duration >= settings.SLOW_QUERY_THRESHOLD_MS:
+            _local.capturing = True
+            try:
+                record(context['connection'], sql, params, many, duration)
+            except Exception:
+                logger.exception('Не удалось записать медленный запрос')
+            finally:
+                _local.capturing = False
+
+
+def record(connection, sql, params, many, duration):
+    # Импорт здесь: instrumentation сам импортирует этот модуль.
+    from .instrumentation import current_stats
+
+    normalized = normalize_sql(sql)
+    key = fingerprint(normalized)
+    origin, serializer = query_origin()
+    stats = current_stats()
+    plan = None
+    if (
+        connection.vendor == 'postgresql'
+        and not many
+        and sql.lstrip().upper().startswith(EXPLAINABLE)
+        and should_explain(key)
+    ):
+        plan = explain(connection, sql, params)
+    logger.warning(json.dumps({
+        'time': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'fingerprint': key,
+        'duration_ms': round(duration, 2),
+        'sql': normalized,
+        'view': getattr(stats, 'view', None),
+        'serializer': serializer,
+        'origin': origin,
+        'plan': plan,
+    }, ensure_ascii=False))
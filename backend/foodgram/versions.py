@@ -0,0 +1,58 @@
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_PREFIX = 'version'
+
+RECIPES = 'recipes'
+TAGS = 'tags'
+INGREDIENTS = 'ingredients'
+USERS = 'users'
+# Счётчики избранного и корзин, по которым сортируются рецепты.
+POPULARITY = 'popularity'
+
+
+def user_scope(user_id):
+    """ Область данных, видимых только одному пользователю. """
+
+    return f'user:{user_id}'
+
+
+def version_key(scope):
+    return f'{VERSION_PREFIX}:{scope}'
+
+
+def get_versions(*scopes):
+    """
+    Метки версий областей данных в кеше.
+    Метка — время последнего изменения в наносекундах, поэтому после
+    вытеснения из кеша она не может вернуться к прежнему значению.
+    """
+
+    keys = [version_key(scope) for scope in scopes]
+    stored = cache.get_many(keys)
+    versions = []
+    for key in keys:
+        if key not in stored:
+            cache.add(key, time.time_ns(), timeout=None)
+            stored[key] = cache.get(key)
+        versions.append(stored[key])
+    return versions
+
+
+def _bump(scopes):
+    now = time.time_ns()
+    cache.set_many(
+        {version_key(scope): now for scope in scopes}, timeout=None
+    )
+
+
+def bump_versions(*scopes):
+    """
+    Сдвигает метки сразу и ещё раз после фиксации транзакции, чтобы
+    ответ, собранный из незафиксированных данных, не остался в кеше.
+    """
+
+    _bump(scopes)
+    transaction.on_commit(lambda: _bump(scopes))
@@ -0,0 +1,21 @@
+"""
+Запуск foodgram.asgi на uvicorn-воркерах, по желанию:
+
+    gunicorn foodgram.asgi:application -c gunicorn.asgi.conf.py
+
+Пока медленный клиент отправляет запрос или читает ответ, uvicorn-воркер
+занят другими запросами, а переключатели и выгрузка из
+api/async_views.py идут в своём пуле потоков. Остальные представления
+синхронные, и под ASGI Django 3.2 выполняет их по одному на воркер,
+поэтому без отдельного замера на своей нагрузке по умолчанию
+используется gunicorn.conf.py с foodgram.wsgi.
+"""
+import os
+import runpy
+
+globals().update(runpy.run_path(
+    os.path.join(os.path.dirname(__file__), 'gunicorn.conf.py')
+))
+worker_class = os.getenv(
+    'GUNICORN_WORKER_CLASS', 'uvicorn.workers.UvicornWorker'
+)
@@ -0,0 +1,12 @@
+import multiprocessing
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0:8000')
+workers = int(
+    os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1)
+)
+# Образ запускает foodgram.wsgi на синхронных воркерах. Запуск
+# foodgram.asgi на uvicorn-воркерах описан в gunicorn.asgi.conf.py.
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'sync')
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+keepalive = 5
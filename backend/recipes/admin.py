@@ -1,5 +1,6 @@
 from django.contrib import admin
 
+from foodgram.admin import LargeTableAdmin
 from foodgram.settings import EMPTY
 
 from .models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
@@ -7,41 +8,44 @@ from .models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
 
 class IngredientsInLine(admin.TabularInline):
     model = Recipe.ingredients.through
+    autocomplete_fields = ['ingredient']
+    extra = 1
 
 
 @admin.register(Favorite)
-class FavoriteAdmin(admin.ModelAdmin):
+class FavoriteAdmin(LargeTableAdmin):
     list_display = ['id', 'user', 'recipe']
-    empty_value_display = EMPTY
+    list_select_related = ['user', 'recipe']
+    search_fields = ['user__username', 'recipe__name']
+    autocomplete_fields = ['user', 'recipe']
 
 
 @admin.register(Ingredient)
-class IngredientAdmin(admin.ModelAdmin):
+class IngredientAdmin(LargeTableAdmin):
     list_display = ['id', 'name', 'measurement_unit']
     search_fields = ['name']
-    empty_value_display = EMPTY
 
 
 @admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
-    list_display = ['id', 'name', 'author', 'favorites']
-    search_fields = ['name', 'author']
+class RecipeAdmin(LargeTableAdmin):
+    list_display = [
+        'id', 'name', 'author', 'favorites_count', 'in_carts_count'
+    ]
+    list_select_related = ['author']
+    search_fields = ['name', 'author__username']
     list_filter = ['tags']
-    empty_value_display = EMPTY
+    autocomplete_fields = ['author']
+    readonly_fields = ['favorites_count', 'in_carts_count']
     inlines = (
         IngredientsInLine,)
 
-    def favorites(self, obj):
-        if Favorite.objects.filter(recipe=obj).exists():
-            return Favorite.objects.filter(recipe=obj).count()
-        return 0
-
 
 @admin.register(ShoppingCart)
-class ShoppingCartAdmin(admin.ModelAdmin):
+class ShoppingCartAdmin(LargeTableAdmin):
     list_display = ['id', 'user', 'recipe']
+    list_select_related = ['user', 'recipe']
     search_fields = ['user__username', 'user__email']
-    empty_value_display = EMPTY
+    autocomplete_fields = ['user', 'recipe']
 
 
 @admin.register(Tag)
@@ -0,0 +1,95 @@
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+from foodgram.versions import RECIPES, bump_versions
+
+from .models import Recipe
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {
+    'jpeg': ('jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+    'webp': ('webp', {'quality': 80, 'method': 4}),
+}
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.RECIPE_IMAGE_WORKERS,
+    thread_name_prefix='recipe-images'
+)
+
+
+def variant_name(name, size, extension):
+    directory, filename = os.path.split(name)
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(
+        directory, 'variants', f'{stem}_{size}.{extension}'
+    )
+
+
+def render_variants(name):
+    """ Уменьшенные копии изображения во всех размерах и форматах. """
+
+    with default_storage.open(name) as file:
+        image = ImageOps.exif_transpose(Image.open(file))
+        image = image.convert('RGB')
+    variants = {}
+    for size, dimensions in settings.RECIPE_IMAGE_SIZES.items():
+        thumbnail = ImageOps.fit(
+            image, dimensions, Image.Resampling.LANCZOS
+        )
+        variants[size] = {}
+        for image_format, (extension, options) in FORMATS.items():
+            buffer = io.BytesIO()
+            thumbnail.save(buffer, image_format.upper(), **options)
+            variants[size][image_format] = default_storage.save(
+                variant_name(name, size, extension),
+                ContentFile(buffer.getvalue())
+            )
+    return variants
+
+
+def delete_variants(variants):
+    for formats in variants.values():
+        for name in formats.values():
+            default_storage.delete(name)
+
+
+def process_recipe_image(recipe_id):
+    """ Задача фонового потока: готовит варианты картинки рецепта. """
+
+    close_old_connections()
+    try:
+        recipe = Recipe.objects.only(
+            'image', 'image_variants'
+        ).get(pk=recipe_id)
+        variants = render_variants(recipe.image.name)
+        updated = Recipe.objects.filter(
+            pk=recipe_id, image=recipe.image.name
+        ).update(image_variants=variants)
+        # Пока шла обработка, картинку могли заменить ещё раз.
+        delete_variants(recipe.image_variants if updated else variants)
+        if updated:
+            bump_versions(RECIPES)
+    except Recipe.DoesNotExist:
+        pass
+    except Exception:
+        logger.exception('Не удалось обработать картинку рецепта %s',
+                         recipe_id)
+    finally:
+        close_old_connections()
+
+
+def schedule_image_processing(recipe):
+    """ Ставит обработку картинки в очередь после фиксации транзакции. """
+
+    transaction.on_commit(
+        lambda: executor.submit(process_recipe_image, recipe.pk)
+    )
@@ -0,0 +1,223 @@
+import csv
+import io
+import json
+import time
+from itertools import islice
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from foodgram.versions import INGREDIENTS, TAGS, bump_versions
+from recipes.models import Ingredient, Tag
+
+DEFAULT_FILES = ['ingredients.csv', 'fixture.json']
+READ_SIZE = 64 * 1024
+
+
+def iter_json_array(file):
+    """ Элементы JSON-массива по одному, без чтения файла целиком. """
+
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    opened = False
+    for chunk in iter(lambda: file.read(READ_SIZE), ''):
+        buffer = buffer[position:] + chunk
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if position == len(buffer):
+                break
+            if not opened:
+                if buffer[position] != '[':
+                    raise CommandError('Ожидался JSON-массив.')
+                opened = True
+                position += 1
+                continue
+            if buffer[position] == ']':
+                return
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                break
+            yield item
+    raise CommandError('JSON-массив оборван.')
+
+
+def read_csv(file):
+    for row in csv.reader(file):
+        if len(row) >= 2:
+            yield 'ingredient', {
+                'name': row[0].strip(),
+                'measurement_unit': row[1].strip(),
+            }
+
+
+def read_json(file):
+    """ Понимает и список ингредиентов, и фикстуру Django. """
+
+    for item in iter_json_array(file):
+        model = item.get('model')
+        fields = item.get('fields', item)
+        if model in (None, 'recipes.ingredient'):
+            yield 'ingredient', {
+                'name': fields['name'].strip(),
+                'measurement_unit': fields['measurement_unit'].strip(),
+            }
+        elif model == 'recipes.tag':
+            yield 'tag', {
+                'name': fields['name'],
+                'color': fields['color'],
+                'slug': fields['slug'],
+            }
+
+
+class CsvStream(io.RawIOBase):
+    """ Файлоподобный поток CSV-строк для COPY ... FROM STDIN. """
+
+    def __init__(self, rows):
+        self.lines = (
+            self.format(row).encode() for row in rows
+        )
+        self.rest = b''
+
+    @staticmethod
+    def format(row):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow(row)
+        return buffer.getvalue()
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        while size < 0 or len(self.rest) < size:
+            line = next(self.lines, None)
+            if line is None:
+                break
+            self.rest += line
+        if size < 0:
+            size = len(self.rest)
+        rest = self.rest
+        self.rest = rest[size:]
+        return rest[:size]
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает теги и ингредиенты из CSV/JSON-файлов каталога. '
+        'Повторный запуск не создаёт дубликатов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths',
+            nargs='*',
+            help='Файлы .csv или .json; по умолчанию '
+                 + ', '.join(DEFAULT_FILES) + ' из CATALOG_DATA_DIR.'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=5000,
+            help='Сколько строк вставлять за один запрос.'
+        )
+        parser.add_argument(
+            '--no-copy',
+            action='store_true',
+            help='Не использовать COPY даже в PostgreSQL.'
+        )
+
+    def handle(self, *args, paths, chunk_size, no_copy, **options):
+        paths = [Path(path) for path in paths] or [
+            Path(settings.CATALOG_DATA_DIR) / name for name in DEFAULT_FILES
+        ]
+        use_copy = connection.vendor == 'postgresql' and not no_copy
+        for path in paths:
+            if not path.exists():
+                raise CommandError(f'Файл {path} не найден.')
+            started = time.monotonic()
+            ingredients_before = Ingredient.objects.count()
+            tags_before = Tag.objects.count()
+            self.read_count = 0
+            with path.open(encoding='utf-8', newline='') as file:
+                records = self.counted(self.read(path, file))
+                with transaction.atomic():
+                    self.load(records, chunk_size, use_copy)
+                    bump_versions(INGREDIENTS, TAGS)
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f'{path.name}: прочитано {self.read_count} строк, '
+                f'новых ингредиентов '
+                f'{Ingredient.objects.count() - ingredients_before}, '
+                f'новых тегов {Tag.objects.count() - tags_before} '
+                f'за {elapsed:.2f} с '
+                f'({self.read_count / max(elapsed, 1e-6):.0f} строк/с)'
+            )
+
+    @staticmethod
+    def read(path, file):
+        if path.suffix == '.csv':
+            return read_csv(file)
+        if path.suffix == '.json':
+            return read_json(file)
+        raise CommandError(f'Неизвестный формат файла {path}.')
+
+    def counted(self, records):
+        for record in records:
+            self.read_count += 1
+            yield record
+
+    def load(self, records, chunk_size, use_copy):
+        tags = []
+
+        def ingredients():
+            for kind, fields in records:
+                if kind == 'tag':
+                    tags.append(Tag(**fields))
+                elif fields['name'] and fields['measurement_unit']:
+                    yield fields['name'], fields['measurement_unit']
+
+        if use_copy:
+            self.copy_ingredients(ingredients())
+        else:
+            self.insert_ingredients(ingredients(), chunk_size)
+        Tag.objects.bulk_create(tags, ignore_conflicts=True)
+
+    @staticmethod
+    def insert_ingredients(rows, chunk_size):
+        while True:
+            chunk = set(islice(rows, chunk_size))
+            if not chunk:
+                return
+            Ingredient.objects.bulk_create(
+                [
+                    Ingredient(name=name, measurement_unit=unit)
+                    for name, unit in chunk
+                ],
+                ignore_conflicts=True
+            )
+
+    @staticmethod
+    def copy_ingredients(rows):
+        table = connection.ops.quote_name(Ingredient._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMPORARY TABLE catalog_ingredient '
+                '(name varchar(200), measurement_unit varchar(200)) '
+                'ON COMMIT DROP'
+            )
+            cursor.copy_expert(
+                'COPY catalog_ingredient (name, measurement_unit) '
+                'FROM STDIN WITH (FORMAT csv)',
+                CsvStream(rows)
+            )
+            cursor.execute(
+                f'INSERT INTO {table} (name, measurement_unit) '
+                'SELECT DISTINCT name, measurement_unit '
+                'FROM catalog_ingredient '
+                'ON CONFLICT (name, measurement_unit) DO NOTHING'
+            )
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from recipes.images import process_recipe_image
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Готовит уменьшенные копии картинок для рецептов без них.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Пересоздать копии для всех рецептов.'
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='')
+        if not options['all']:
+            recipes = recipes.filter(image_variants={})
+        processed = 0
+        for recipe_id in recipes.values_list('id', flat=True).iterator():
+            process_recipe_image(recipe_id)
+            processed += 1
+        self.stdout.write(f'Обработано рецептов: {processed}.')
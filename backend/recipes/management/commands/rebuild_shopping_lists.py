@@ -0,0 +1,67 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.models import ShoppingListItem
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает агрегированные списки покупок по корзинам '
+        'и проверяет результат.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только сравнить списки с корзинами, ничего не меняя.'
+        )
+        parser.add_argument(
+            '--user',
+            type=int,
+            action='append',
+            dest='user_ids',
+            help='Ограничиться пользователем с указанным id.'
+        )
+
+    def handle(self, *args, check=False, user_ids=None, **options):
+        if not check:
+            with transaction.atomic():
+                ShoppingListItem.objects.rebuild(user_ids)
+            self.stdout.write('Списки покупок пересчитаны.')
+        mismatches = self.find_mismatches(user_ids)
+        if mismatches:
+            for (user_id, ingredient_id), (stored, expected) in list(
+                mismatches.items()
+            )[:20]:
+                self.stderr.write(
+                    f'user={user_id} ingredient={ingredient_id}: '
+                    f'в списке {stored}, по корзине {expected}'
+                )
+            raise CommandError(f'Расхождений: {len(mismatches)}.')
+        self.stdout.write(self.style.SUCCESS(
+            'Списки покупок совпадают с корзинами.'
+        ))
+
+    @staticmethod
+    def find_mismatches(user_ids):
+        items = ShoppingListItem.objects.all()
+        if user_ids is not None:
+            items = items.filter(user_id__in=user_ids)
+        stored = {
+            (user_id, ingredient_id): amount
+            for user_id, ingredient_id, amount in items.values_list(
+                'user_id', 'ingredient_id', 'amount'
+            ).iterator()
+        }
+        expected = {
+            (row['user_id'], row['ingredient_id']): row['total']
+            for row in ShoppingListItem.objects.from_carts(
+                user_ids
+            ).iterator()
+        }
+        return {
+            key: (stored.get(key, 0), expected.get(key, 0))
+            for key in stored.keys() | expected.keys()
+            if stored.get(key, 0) != expected.get(key, 0)
+        }
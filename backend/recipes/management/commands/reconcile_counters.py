@@ -0,0 +1,70 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import models, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Subscription, User
+
+
+def count_of(model, field):
+    """ Число строк model, ссылающихся на внешнюю строку через field. """
+
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')}).order_by().values(
+            field
+        ).annotate(total=Count('pk')).values('total')[:1],
+        output_field=models.PositiveIntegerField()
+    ), 0)
+
+
+COUNTERS = [
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (Recipe, 'in_carts_count', ShoppingCart, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'followers_count', Subscription, 'author'),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Сверяет счётчики избранного, корзин, рецептов и подписчиков '
+        'с фактическими '
+        'данными и исправляет расхождения.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только найти расхождения, ничего не меняя.'
+        )
+
+    def handle(self, *args, check=False, **options):
+        drifted = 0
+        for model, counter, source, field in COUNTERS:
+            with transaction.atomic():
+                rows = model.objects.annotate(
+                    actual=count_of(source, field)
+                ).exclude(**{counter: F('actual')})
+                for pk, stored, actual in rows.values_list(
+                    'pk', counter, 'actual'
+                )[:20]:
+                    self.stderr.write(
+                        f'{model._meta.model_name}={pk} {counter}: '
+                        f'хранится {stored}, на самом деле {actual}'
+                    )
+                found = rows.count()
+                if found and not check:
+                    model.objects.filter(
+                        pk__in=rows.values('pk')
+                    ).update(**{counter: count_of(source, field)})
+            drifted += found
+            self.stdout.write(
+                f'{model._meta.model_name}.{counter}: расхождений {found}'
+            )
+        if check and drifted:
+            raise CommandError(f'Расхождений: {drifted}.')
+        self.stdout.write(self.style.SUCCESS(
+            'Счётчики исправлены.' if drifted else 'Счётчики в порядке.'
+        ))
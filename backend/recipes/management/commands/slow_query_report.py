@@ -0,0 +1,116 @@
+import json
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class QueryStats:
+    """ Сводка по одному нормализованному запросу. """
+
+    def __init__(self, sql):
+        self.sql = sql
+        self.calls = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.sources = Counter()
+        self.plan = None
+        self.plan_time = ''
+
+    def add(self, entry):
+        self.calls += 1
+        self.total_ms += entry['duration_ms']
+        self.max_ms = max(self.max_ms, entry['duration_ms'])
+        source = ' / '.join(
+            part for part in (
+                entry.get('view'), entry.get('serializer'), entry.get('origin')
+            ) if part
+        )
+        self.sources[source or 'неизвестно'] += 1
+        if entry.get('plan') and entry.get('time', '') >= self.plan_time:
+            self.plan, self.plan_time = entry['plan'], entry.get('time', '')
+
+
+class Command(BaseCommand):
+    help = (
+        'Сводка журнала медленных запросов (SLOW_QUERY_LOG): '
+        'запросы с наибольшим суммарным временем.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            default=settings.SLOW_QUERY_LOG_PATH,
+            help='Журнал; ротированные файлы .1, .2, ... читаются тоже.'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=10,
+            help='Сколько запросов показать.'
+        )
+        parser.add_argument(
+            '--plans',
+            action='store_true',
+            help='Показать последний снятый план каждого запроса.'
+        )
+
+    def handle(self, *args, path, limit, plans, **options):
+        files = self.log_files(Path(path))
+        if not files:
+            raise CommandError(f'Журнал {path} не найден.')
+        queries = {}
+        skipped = 0
+        for entry in self.entries(files):
+            if entry is None:
+                skipped += 1
+                continue
+            stats = queries.setdefault(
+                entry['fingerprint'], QueryStats(entry['sql'])
+            )
+            stats.add(entry)
+        top = sorted(
+            queries.values(), key=lambda stats: stats.total_ms, reverse=True
+        )[:limit]
+        for number, stats in enumerate(top, 1):
+            self.stdout.write(
+                f'{number}. всего {stats.total_ms:.0f} мс, '
+                f'вызовов {stats.calls}, '
+                f'в среднем {stats.total_ms / stats.calls:.0f} мс, '
+                f'максимум {stats.max_ms:.0f} мс'
+            )
+            self.stdout.write(f'   {stats.sql}')
+            for source, calls in stats.sources.most_common(3):
+                self.stdout.write(f'   {calls} × {source}')
+            if plans and stats.plan:
+                for line in stats.plan.splitlines():
+                    self.stdout.write(f'     {line}')
+        if skipped:
+            self.stderr.write(f'Пропущено строк не в формате JSON: {skipped}')
+
+    @staticmethod
+    def log_files(path):
+        files = [path] if path.exists() else []
+        number = 1
+        while Path(f'{path}.{number}').exists():
+            files.append(Path(f'{path}.{number}'))
+            number += 1
+        return files
+
+    @staticmethod
+    def entries(files):
+        for file in files:
+            with file.open(encoding='utf-8') as lines:
+                for line in lines:
+                    if not line.strip():
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        yield None
+                        continue
+                    if isinstance(entry, dict) and 'fingerprint' in entry:
+                        yield entry
+                    else:
+                        yield None
@@ -0,0 +1,50 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F, Sum
+
+
+def fill_shopping_lists(apps, schema_editor):
+    recipe_ingredient = apps.get_model('recipes', 'RecipeIngredient')
+    shopping_list_item = apps.get_model('recipes', 'ShoppingListItem')
+    rows = recipe_ingredient.objects.filter(
+        recipe__shopping_cart__isnull=False
+    ).values(
+        'ingredient_id', user_id=F('recipe__shopping_cart__user')
+    ).annotate(total=Sum('amount')).order_by()
+    shopping_list_item.objects.bulk_create(
+        [
+            shopping_list_item(
+                user_id=row['user_id'],
+                ingredient_id=row['ingredient_id'],
+                amount=row['total']
+            )
+            for row in rows
+        ],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0007_alter_recipe_cooking_time'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingListItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.PositiveIntegerField(verbose_name='Количество')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='recipes.ingredient', verbose_name='Ингредиент')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_list', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='shoppinglistitem',
+            constraint=models.UniqueConstraint(fields=('user', 'ingredient'), name='user_shopping_list_item_unique'),
+        ),
+        migrations.RunPython(fill_shopping_lists, migrations.RunPython.noop),
+    ]
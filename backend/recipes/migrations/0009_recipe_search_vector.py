@@ -0,0 +1,65 @@
+import django.contrib.postgres.search
+from django.db import migrations
+
+FORWARD_SQL = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    '''
+    CREATE FUNCTION recipes_recipe_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('pg_catalog.russian', coalesce(NEW.name, '')), 'A')
+            || setweight(to_tsvector('pg_catalog.russian', coalesce(NEW.text, '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    ''',
+    '''
+    CREATE TRIGGER recipes_recipe_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF name, text ON recipes_recipe
+    FOR EACH ROW EXECUTE PROCEDURE recipes_recipe_search_vector_update()
+    ''',
+    'UPDATE recipes_recipe SET name = name',
+    '''
+    CREATE INDEX recipes_recipe_search_vector_idx
+    ON recipes_recipe USING gin (search_vector)
+    ''',
+    '''
+    CREATE INDEX recipes_recipe_name_trgm_idx
+    ON recipes_recipe USING gin (name gin_trgm_ops)
+    ''',
+]
+
+BACKWARD_SQL = [
+    'DROP INDEX IF EXISTS recipes_recipe_name_trgm_idx',
+    'DROP INDEX IF EXISTS recipes_recipe_search_vector_idx',
+    'DROP TRIGGER IF EXISTS recipes_recipe_search_vector_trigger '
+    'ON recipes_recipe',
+    'DROP FUNCTION IF EXISTS recipes_recipe_search_vector_update()',
+]
+
+
+def run_postgresql(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_shoppinglistitem'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(
+            run_postgresql(FORWARD_SQL), run_postgresql(BACKWARD_SQL)
+        ),
+    ]
@@ -0,0 +1,47 @@
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_for(model):
+    return Coalesce(Subquery(
+        model.objects.filter(recipe=OuterRef('pk')).values(
+            'recipe'
+        ).annotate(total=Count('pk')).values('total')[:1],
+        output_field=models.PositiveIntegerField()
+    ), 0)
+
+
+def fill_counters(apps, schema_editor):
+    recipe = apps.get_model('recipes', 'Recipe')
+    favorite = apps.get_model('recipes', 'Favorite')
+    shopping_cart = apps.get_model('recipes', 'ShoppingCart')
+    recipe.objects.update(
+        favorites_count=count_for(favorite),
+        in_carts_count=count_for(shopping_cart),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_recipe_pub_date_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В избранном'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_carts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В списках покупок'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-favorites_count', '-id'], name='recipe_favorites_count_idx'),
+        ),
+    ]
@@ -1,7 +1,15 @@
+import heapq
+from collections import Counter
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
-from django.db import models
-from users.models import User
-from django.db.models import UniqueConstraint
+from django.db import connection, models
+from django.db.models import F, Q, Sum, UniqueConstraint, Window
+from django.db.models.functions import Greatest, RowNumber
+
+from users.models import Subscription, User
 
 
 class Tag(models.Model):
@@ -26,15 +34,38 @@ class Ingredient(models.Model):
     name = models.CharField(max_length=200,
                             verbose_name='Название ингридиента',
                             )
-    quantity = models.CharField('Количество',
-                                max_length=200)
     measurement_unit = models.CharField('Единицы измерения',
                                         max_length=200)
 
+    class Meta:
+        ordering = ['name']
+        verbose_name = 'Ингредиент'
+        verbose_name_plural = 'Ингредиенты'
+        constraints = [
+            UniqueConstraint(
+                fields=['name', 'measurement_unit'],
+                name='ingredient_name_unit_unique'
+            )
+        ]
+
     def __str__(self):
         return self.name
 
 
+class RecipeManager(models.Manager):
+    """ Поисковый вектор нужен только в фильтре и не читается в модель. """
+
+    def get_queryset(self):
+        return super().get_queryset().defer('search_vector')
+
+    def change_counter(self, recipe_ids, field, delta):
+        """ Сдвигает счётчик field у рецептов одним UPDATE. """
+
+        return self.filter(pk__in=recipe_ids).update(
+            **{field: Greatest(F(field) + delta, 0)}
+        )
+
+
 class Recipe(models.Model):
     """Базовая модель рецепт"""
     author = models.ForeignKey(
@@ -52,6 +83,13 @@ class Recipe(models.Model):
         upload_to='recipes/images/'
     )
 
+    image_variants = models.JSONField(
+        'Уменьшенные копии изображения',
+        default=dict,
+        blank=True,
+        editable=False
+    )
+
     text = models.TextField(
         'Описание рецепта',
         help_text='Введите описание рецепта'
@@ -77,6 +115,47 @@ class Recipe(models.Model):
         )]
     )
 
+    pub_date = models.DateTimeField(
+        'Время публикации',
+        auto_now_add=True
+    )
+
+    favorites_count = models.PositiveIntegerField(
+        'В избранном',
+        default=0,
+        editable=False
+    )
+
+    in_carts_count = models.PositiveIntegerField(
+        'В списках покупок',
+        default=0,
+        editable=False
+    )
+
+    # Заполняется триггером PostgreSQL из name и text.
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = RecipeManager()
+
+    class Meta:
+        ordering = ('-pub_date', '-id')
+        verbose_name = 'Рецепт'
+        verbose_name_plural = 'Рецепты'
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='recipe_pub_date_id_idx'
+            ),
+            models.Index(
+                fields=['-favorites_count', '-id'],
+                name='recipe_favorites_count_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='recipe_author_pub_date_idx'
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -179,3 +258,342 @@ class Favorite(models.Model):
                 name='user_favorite_unique'
             )
         ]
+
+
+class ShoppingListItemManager(models.Manager):
+    """
+    Поддержка агрегированного списка покупок.
+    Все методы вызываются в той же транзакции, что и изменение корзины
+    или состава рецепта: из сигналов recipes/signals.py, а для
+    bulk-операций, которые сигналов не посылают, — явно.
+    """
+
+    batch_size = 1000
+
+    def from_carts(self, user_ids=None):
+        """ Список покупок, посчитанный заново по корзинам. """
+
+        rows = RecipeIngredient.objects.filter(
+            recipe__shopping_cart__isnull=False
+        )
+        if user_ids is not None:
+            rows = rows.filter(recipe__shopping_cart__user__in=user_ids)
+        return rows.values(
+            'ingredient_id', user_id=F('recipe__shopping_cart__user')
+        ).annotate(total=Sum('amount')).order_by()
+
+    def apply(self, deltas):
+        """
+        Изменяет количества на deltas[(user_id, ingredient_id)].
+        Прибавки пишутся INSERT ... ON CONFLICT DO UPDATE, поэтому
+        строка, параллельно созданная другой транзакцией, не приводит
+        к ошибке уникальности; убавки применяются к заблокированным
+        строкам, и строки с нулём удаляются.
+        """
+
+        increments = [
+            (user_id, ingredient_id, delta)
+            for (user_id, ingredient_id), delta in deltas.items()
+            if delta > 0
+        ]
+        decrements = {key: delta for key, delta in deltas.items() if delta < 0}
+        for start in range(0, len(increments), self.batch_size):
+            self.increment(increments[start:start + self.batch_size])
+        if not decrements:
+            return
+        items = self.select_for_update().filter(
+            user_id__in={user_id for user_id, _ in decrements},
+            ingredient_id__in={
+                ingredient_id for _, ingredient_id in decrements
+            }
+        )
+        to_update, to_delete = [], []
+        for item in items:
+            delta = decrements.get((item.user_id, item.ingredient_id))
+            if delta is None:
+                continue
+            item.amount += delta
+            if item.amount > 0:
+                to_update.append(item)
+            else:
+                to_delete.append(item.pk)
+        self.bulk_update(to_update, ['amount'])
+        self.filter(pk__in=to_delete).delete()
+
+    def increment(self, rows):
+        """ Прибавляет amount к строкам (user_id, ingredient_id, amount). """
+
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        values = ', '.join(['(%s, %s, %s)'] * len(rows))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} (user_id, ingredient_id, amount) '
+                f'VALUES {values} '
+                'ON CONFLICT (user_id, ingredient_id) DO UPDATE '
+                f'SET amount = {table}.amount + EXCLUDED.amount',
+                [value for row in rows for value in row]
+            )
+
+    def add_recipes(self, user_id, recipe_ids, sign=1):
+        """ Добавляет ингредиенты рецептов в список покупок. """
+
+        amounts = Counter()
+        for ingredient_id, amount in RecipeIngredient.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values_list('ingredient_id', 'amount'):
+            amounts[ingredient_id] += amount
+        self.apply({
+            (user_id, ingredient_id): sign * amount
+            for ingredient_id, amount in amounts.items()
+        })
+
+    def remove_recipes(self, user_id, recipe_ids):
+        """ Убирает ингредиенты рецептов из списка покупок. """
+
+        self.add_recipes(user_id, recipe_ids, sign=-1)
+
+    def change_recipe(self, recipe, old_amounts, new_amounts):
+        """
+        Переносит изменение состава рецепта в списки покупок всех
+        пользователей, у которых рецепт лежит в корзине.
+        """
+
+        changes = {
+            ingredient_id: (
+                new_amounts.get(ingredient_id, 0)
+                - old_amounts.get(ingredient_id, 0)
+            )
+            for ingredient_id in old_amounts.keys() | new_amounts.keys()
+        }
+        changes = {key: delta for key, delta in changes.items() if delta}
+        if not changes:
+            return
+        user_ids = ShoppingCart.objects.filter(
+            recipe=recipe
+        ).values_list('user_id', flat=True)
+        self.apply({
+            (user_id, ingredient_id): delta
+            for user_id in user_ids
+            for ingredient_id, delta in changes.items()
+        })
+
+    def rebuild(self, user_ids=None, batch_size=1000):
+        """ Пересчитывает список покупок по корзинам с нуля. """
+
+        items = self.all()
+        if user_ids is not None:
+            items = items.filter(user_id__in=user_ids)
+        items.delete()
+        batch = []
+        for row in self.from_carts(user_ids).iterator(chunk_size=batch_size):
+            batch.append(self.model(
+                user_id=row['user_id'],
+                ingredient_id=row['ingredient_id'],
+                amount=row['total']
+            ))
+            if len(batch) >= batch_size:
+                self.bulk_create(batch)
+                batch = []
+        self.bulk_create(batch)
+
+
+class ShoppingListItem(models.Model):
+    """ Строка списка покупок: сумма ингредиента по корзине. """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь',
+        related_name='shopping_list',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        verbose_name='Ингредиент'
+    )
+    amount = models.PositiveIntegerField('Количество')
+
+    objects = ShoppingListItemManager()
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='user_shopping_list_item_unique'
+            )
+        ]
+
+
+class FeedEntryManager(models.Manager):
+    """ Заполнение ленты подписок при публикации и подписке. """
+
+    @staticmethod
+    def is_fanned_out(author):
+        return author.followers_count <= settings.FEED_FANOUT_THRESHOLD
+
+    def fan_out(self, recipe):
+        """ Раскладывает новый рецепт в ленты подписчиков автора. """
+
+        if not self.is_fanned_out(recipe.author):
+            return
+        followers = Subscription.objects.filter(
+            author_id=recipe.author_id
+        ).values_list('user_id', flat=True).iterator(
+            chunk_size=settings.FEED_FANOUT_BATCH_SIZE
+        )
+        while True:
+            batch = list(islice(followers, settings.FEED_FANOUT_BATCH_SIZE))
+            if not batch:
+                return
+            self.bulk_create(
+                [
+                    FeedEntry(
+                        user_id=user_id,
+                        recipe_id=recipe.id,
+                        author_id=recipe.author_id,
+                        pub_date=recipe.pub_date
+                    )
+                    for user_id in batch
+                ],
+                ignore_conflicts=True
+            )
+
+    def backfill(self, user, authors):
+        """
+        Добавляет в ленту последние рецепты новых авторов одним
+        INSERT ... SELECT: рецепты нумеруются ROW_NUMBER() в разрезе
+        автора, и в ленту попадают первые FEED_BACKFILL_LIMIT из них.
+        """
+
+        author_ids = [
+            author.pk for author in authors if self.is_fanned_out(author)
+        ]
+        if not author_ids:
+            return
+        latest = Recipe.objects.filter(author__in=author_ids).annotate(
+            feed_rank=Window(
+                expression=RowNumber(),
+                partition_by=[F('author')],
+                order_by=[F('pub_date').desc(), F('id').desc()],
+            )
+        ).order_by().values('id', 'author_id', 'pub_date', 'feed_rank')
+        sql, params = latest.query.sql_with_params()
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} (user_id, recipe_id, author_id, '
+                'pub_date) '
+                'SELECT %s, latest.id, latest.author_id, latest.pub_date '
+                f'FROM ({sql}) AS latest '
+                'WHERE latest.feed_rank <= %s '
+                'ON CONFLICT DO NOTHING',
+                (user.pk, *params, settings.FEED_BACKFILL_LIMIT)
+            )
+
+    def prune(self, user, authors):
+        """ Убирает из ленты рецепты авторов, от которых отписались. """
+
+        return self.filter(user=user, author__in=authors).delete()
+
+    @staticmethod
+    def after(queryset, id_field, position, reverse):
+        """
+        Ключи (pub_date, id) выборки после позиции в порядке ленты,
+        а при reverse — перед ней в обратном порядке.
+        """
+
+        if reverse:
+            lookup, ordering = 'gt', ('pub_date', id_field)
+        else:
+            lookup, ordering = 'lt', ('-pub_date', f'-{id_field}')
+        if position is not None:
+            pub_date, pk = position
+            queryset = queryset.filter(
+                Q(**{f'pub_date__{lookup}': pub_date})
+                | Q(pub_date=pub_date, **{f'{id_field}__{lookup}': pk})
+            )
+        return queryset.order_by(*ordering).values_list('pub_date', id_field)
+
+    def page(self, user, limit, position=None, reverse=False):
+        """
+        Страница ленты: ключи (pub_date, id) рецептов по убыванию после
+        позиции (при reverse — перед ней) и признак, что за страницей
+        есть ещё рецепты.
+        Материализованная лента и рецепты авторов, которым лента не
+        раскладывается, читаются двумя запросами по своим индексам
+        и сливаются; рецепт, попавший в оба источника, берётся один раз.
+        """
+
+        sources = [
+            self.after(self.filter(user=user), 'recipe_id', position, reverse)
+        ]
+        large_authors = list(User.objects.filter(
+            author__user=user,
+            followers_count__gt=settings.FEED_FANOUT_THRESHOLD
+        ).values_list('id', flat=True))
+        if large_authors:
+            sources.append(self.after(
+                Recipe.objects.filter(author__in=large_authors),
+                'id', position, reverse
+            ))
+        keys = []
+        merged = heapq.merge(
+            *(source[:limit + 1] for source in sources), reverse=not reverse
+        )
+        for key in merged:
+            if keys and keys[-1] == key:
+                continue
+            keys.append(key)
+            if len(keys) > limit:
+                break
+        has_more = len(keys) > limit
+        keys = keys[:limit]
+        if reverse:
+            keys.reverse()
+        return keys, has_more
+
+
+class FeedEntry(models.Model):
+    """ Рецепт в ленте подписчика его автора. """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Подписчик',
+        related_name='feed',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        verbose_name='Рецепт',
+        related_name='feed_entries',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Автор',
+        related_name='+',
+    )
+    pub_date = models.DateTimeField('Время публикации')
+
+    objects = FeedEntryManager()
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Лента подписок'
+        constraints = [
+            UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='user_feed_entry_unique'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-recipe'],
+                name='feed_user_pub_date_idx'
+            ),
+            models.Index(
+                fields=['user', 'author'],
+                name='feed_user_author_idx'
+            ),
+        ]
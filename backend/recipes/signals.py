@@ -0,0 +1,100 @@
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from foodgram.versions import POPULARITY, bump_versions
+from users.models import User
+
+from .models import (Favorite, FeedEntry, Recipe, RecipeIngredient,
+                     ShoppingCart, ShoppingListItem)
+
+COUNTERS = {
+    Favorite: 'favorites_count',
+    ShoppingCart: 'in_carts_count',
+}
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+def count_added(sender, instance, created, **kwargs):
+    if created:
+        Recipe.objects.change_counter(
+            [instance.recipe_id], COUNTERS[sender], 1
+        )
+        bump_versions(POPULARITY)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+def count_removed(sender, instance, **kwargs):
+    Recipe.objects.change_counter(
+        [instance.recipe_id], COUNTERS[sender], -1
+    )
+    bump_versions(POPULARITY)
+
+
+@receiver(post_save, sender=Recipe)
+def count_recipe_added(sender, instance, created, **kwargs):
+    if created:
+        User.objects.filter(pk=instance.author_id).update(
+            recipes_count=F('recipes_count') + 1
+        )
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_recipe(sender, instance, created, **kwargs):
+    if created:
+        FeedEntry.objects.fan_out(instance)
+
+
+@receiver(post_delete, sender=Recipe)
+def count_recipe_removed(sender, instance, **kwargs):
+    User.objects.filter(pk=instance.author_id).update(
+        recipes_count=Greatest(F('recipes_count') - 1, 0)
+    )
+
+
+# Список покупок. Удаление корзины и строки состава учитывается после
+# удаления: при каскадном удалении рецепта, в каком бы порядке ни
+# удалялись его корзины и состав, второе из удалений уже не находит
+# первого, и ингредиенты вычитаются ровно один раз.
+
+@receiver(post_save, sender=ShoppingCart)
+def add_to_shopping_list(sender, instance, created, **kwargs):
+    if created:
+        ShoppingListItem.objects.add_recipes(
+            instance.user_id, [instance.recipe_id]
+        )
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def remove_from_shopping_list(sender, instance, **kwargs):
+    ShoppingListItem.objects.remove_recipes(
+        instance.user_id, [instance.recipe_id]
+    )
+
+
+@receiver(pre_save, sender=RecipeIngredient)
+def remember_recipe_ingredient(sender, instance, **kwargs):
+    instance.saved_amounts = {}
+    if instance.pk is not None:
+        instance.saved_amounts = dict(RecipeIngredient.objects.filter(
+            pk=instance.pk
+        ).values_list('ingredient_id', 'amount'))
+
+
+@receiver(post_save, sender=RecipeIngredient)
+def change_shopping_lists(sender, instance, **kwargs):
+    ShoppingListItem.objects.change_recipe(
+        instance.recipe_id,
+        instance.saved_amounts,
+        {instance.ingredient_id: instance.amount}
+    )
+
+
+@receiver(post_delete, sender=RecipeIngredient)
+def remove_from_shopping_lists(sender, instance, **kwargs):
+    ShoppingListItem.objects.change_recipe(
+        instance.recipe_id, {instance.ingredient_id: instance.amount}, {}
+    )
@@ -0,0 +1,91 @@
+import pytest
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from users.models import Subscription, User
+
+VARIANTS = {
+    'small': {
+        'jpeg': 'recipes/images/variants/a_small.jpg',
+        'webp': 'recipes/images/variants/a_small.webp',
+    },
+    'medium': {
+        'jpeg': 'recipes/images/variants/a_medium.jpg',
+        'webp': 'recipes/images/variants/a_medium.webp',
+    },
+}
+
+
+@pytest.fixture
+def make_request():
+    """ Запрос DRF от имени пользователя с параметрами query. """
+
+    def make(user, query=''):
+        request = Request(APIRequestFactory().get(f'/api/recipes/{query}'))
+        request.user = user
+        return request
+
+    return make
+
+
+@pytest.fixture
+def catalog_data(db):
+    """
+    Авторы, подписчик и рецепты на все случаи представления: с тегами
+    и без, с ингредиентами и без, с копиями картинки и без, в
+    избранном и корзине подписчика и вне их.
+    """
+
+    authors = [
+        User.objects.create(
+            username=f'author{number}', email=f'author{number}@example.com',
+            first_name='Имя', last_name='Фамилия'
+        )
+        for number in range(3)
+    ]
+    reader = User.objects.create(
+        username='reader', email='reader@example.com'
+    )
+    tags = [
+        Tag.objects.create(
+            name=f'Тег {number}', color=f'#00000{number}', slug=f'tag{number}'
+        )
+        for number in range(2)
+    ]
+    ingredients = [
+        Ingredient.objects.create(
+            name=f'ингредиент {number}', measurement_unit='г'
+        )
+        for number in range(4)
+    ]
+    recipes = []
+    for number in range(6):
+        recipe = Recipe.objects.create(
+            author=authors[number % 2],
+            name=f'Рецепт {number}',
+            text='Описание "в кавычках"\nи с переводом строки',
+            cooking_time=5 + number,
+            image=f'recipes/images/{number}.jpg',
+            image_variants=VARIANTS if number % 2 else {},
+        )
+        if number % 3:
+            recipe.tags.set(tags[:number % 3])
+        if number != 5:
+            for ingredient in ingredients[:number % 4 + 1]:
+                RecipeIngredient.objects.create(
+                    recipe=recipe, ingredient=ingredient, amount=number + 1
+                )
+        recipes.append(recipe)
+    for author in authors:
+        Subscription.objects.create(user=reader, author=author)
+    Favorite.objects.create(user=reader, recipe=recipes[0])
+    Favorite.objects.create(user=reader, recipe=recipes[3])
+    ShoppingCart.objects.create(user=reader, recipe=recipes[3])
+    ShoppingCart.objects.create(user=reader, recipe=recipes[4])
+    return {
+        'authors': authors,
+        'reader': reader,
+        'recipes': recipes,
+    }
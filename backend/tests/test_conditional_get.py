@@ -0,0 +1,90 @@
+"""
+Условные GET-запросы: слабое сравнение ETag и валидаторы профилей
+пользователей /api/v1/users/{username}/ и /api/v1/users/me/.
+"""
+import time
+
+import pytest
+from django.core.cache import cache
+from rest_framework.test import APIClient
+
+from api.cache import etag_matches
+from foodgram.versions import TAGS, bump_versions
+from users.models import User
+
+
+@pytest.mark.parametrize('header, etag, expected', [
+    ('"abc"', '"abc"', True),
+    ('W/"abc"', '"abc"', True),
+    ('"abc"', 'W/"abc"', True),
+    ('"x", W/"abc"', '"abc"', True),
+    ('*', '"abc"', True),
+    ('"abc"', '"abd"', False),
+    ('"W/abc"', '"abc"', False),
+    ('', '"abc"', False),
+])
+def test_etag_matches(header, etag, expected):
+    assert etag_matches(header, etag) is expected
+
+
+@pytest.fixture
+def client():
+    cache.clear()
+    return APIClient()
+
+
+def test_profile_not_modified(client, catalog_data):
+    admin, author = catalog_data['reader'], catalog_data['authors'][2]
+    admin.role = User.ROLE_ADMIN
+    admin.save()
+    client.force_authenticate(admin)
+    url = f'/api/v1/users/{author.username}/'
+    response = client.get(url)
+    assert response.status_code == 200
+    assert client.get(
+        url, HTTP_IF_NONE_MATCH=response['ETag']
+    ).status_code == 304
+    author.first_name = 'Другое'
+    author.save()
+    assert client.get(
+        url, HTTP_IF_NONE_MATCH=response['ETag']
+    ).status_code == 200
+
+
+def test_me_not_modified(client, catalog_data):
+    reader = catalog_data['reader']
+    client.force_authenticate(reader)
+    response = client.get('/api/v1/users/me/')
+    assert response.data['username'] == 'reader'
+    assert client.get(
+        '/api/v1/users/me/', HTTP_IF_NONE_MATCH=response['ETag']
+    ).status_code == 304
+    reader.first_name = 'Другое'
+    reader.save()
+    assert client.get(
+        '/api/v1/users/me/', HTTP_IF_NONE_MATCH=response['ETag']
+    ).status_code == 200
+
+
+def test_me_etag_depends_on_user(client, catalog_data):
+    client.force_authenticate(catalog_data['reader'])
+    etag = client.get('/api/v1/users/me/')['ETag']
+    client.force_authenticate(catalog_data['authors'][0])
+    assert client.get(
+        '/api/v1/users/me/', HTTP_IF_NONE_MATCH=etag
+    ).status_code == 200
+
+
+def test_last_modified_skips_current_second(client, monkeypatch, db):
+    bump_versions(TAGS)
+    response = client.get('/api/v1/tags/')
+    assert response.status_code == 200
+    assert not response.has_header('Last-Modified')
+    assert response.has_header('ETag')
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now + 1)
+    response = client.get('/api/v1/tags/')
+    assert response.has_header('Last-Modified')
+    assert client.get(
+        '/api/v1/tags/', HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+    ).status_code == 304
@@ -0,0 +1,77 @@
+"""
+Выгрузки списка покупок. PDF собирается вручную постранично, поэтому
+документ разбирается pypdf в строгом режиме: ошибка в xref, потоках
+или шрифтах после обновления reportlab провалит тест.
+"""
+import csv
+import io
+
+import pytest
+from pypdf import PdfReader
+
+from api.exporters import (CsvExporter, PdfExporter, ShoppingListExporter,
+                           TextExporter)
+
+
+def make_rows(count):
+    return [
+        {
+            'name': f'Ингредиент № {number}',
+            'amount': number + 1,
+            'measurement_unit': 'г',
+        }
+        for number in range(count)
+    ]
+
+
+def export(exporter_class, rows):
+    return b''.join(exporter_class(iter(rows)))
+
+
+def test_base_exporter_is_abstract():
+    with pytest.raises(TypeError):
+        ShoppingListExporter([])
+
+
+@pytest.mark.parametrize('count, pages', [(0, 1), (3, 1), (120, 4)])
+def test_pdf_is_valid(count, pages):
+    rows = make_rows(count)
+    reader = PdfReader(io.BytesIO(export(PdfExporter, rows)), strict=True)
+    assert len(reader.pages) == pages
+    assert reader.metadata.title == PdfExporter.title
+    text = ''.join(page.extract_text() for page in reader.pages)
+    assert PdfExporter.title in text
+    for row in rows:
+        assert PdfExporter.format_row(row) in text
+
+
+def test_pdf_streams_pages_before_fonts():
+    parts = list(PdfExporter(iter(make_rows(120))))
+    assert parts[0].startswith(b'%PDF-')
+    page_parts = [part for part in parts if b'/Type /Page ' in part]
+    assert len(page_parts) == 4
+    assert parts.index(page_parts[-1]) < next(
+        index for index, part in enumerate(parts) if b'/FontFile2' in part
+    )
+
+
+def test_pdf_exporters_do_not_share_font_state():
+    first = PdfExporter(iter(make_rows(1)))
+    export(PdfExporter, make_rows(2))
+    assert b''.join(first)
+    assert first not in first.font.state
+
+
+def test_text_and_csv():
+    rows = make_rows(2)
+    text = export(TextExporter, rows).decode()
+    assert text.splitlines() == [
+        f'{TextExporter.title}:', *map(TextExporter.format_row, rows)
+    ]
+    lines = list(csv.reader(io.StringIO(
+        export(CsvExporter, rows).decode('utf-8-sig')
+    )))
+    assert lines[1:] == [
+        [row['name'], str(row['amount']), row['measurement_unit']]
+        for row in rows
+    ]
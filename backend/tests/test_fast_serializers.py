@@ -0,0 +1,99 @@
+"""
+Сверка быстрых сериализаторов из api/fast_serializers.py с эталонными
+сериализаторами DRF: одни и те же данные должны давать один и тот же
+JSON байт в байт.
+"""
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from rest_framework.renderers import JSONRenderer
+
+from api.fast_serializers import (FastRecipeSerializer,
+                                  FastSubscriptionSerializer)
+from api.querysets import annotate_is_subscribed, with_viewer_state
+from api.serializers import RecipeSerializer, ShowSubscriptionsSerializer
+from recipes.models import Recipe
+from users.models import User
+
+FIELD_QUERIES = [
+    '',
+    '?view=card',
+    '?fields=id,author,tags',
+    '?fields=is_favorited,is_in_shopping_cart,name',
+    '?fields=ingredients&fields=images',
+    '?omit=text,ingredients',
+    '?omit=author,tags,is_favorited',
+]
+
+
+def render(data):
+    return JSONRenderer().render(data)
+
+
+def drf_recipes(request, fields):
+    queryset = with_viewer_state(Recipe.objects.all(), request.user, fields)
+    return render(RecipeSerializer(
+        queryset, many=True, context={'request': request, 'fields': fields}
+    ).data)
+
+
+def fast_recipes(request, fields):
+    serializer = FastRecipeSerializer(request, fields)
+    return render(serializer.serialize(serializer.rows(Recipe.objects.all())))
+
+
+@pytest.mark.parametrize('query', FIELD_QUERIES)
+@pytest.mark.parametrize('viewer', ['anonymous', 'reader', 'author'])
+def test_recipes_match_drf(catalog_data, make_request, query, viewer):
+    user = {
+        'anonymous': AnonymousUser(),
+        'reader': catalog_data['reader'],
+        'author': catalog_data['authors'][0],
+    }[viewer]
+    request = make_request(user, query)
+    fields = RecipeSerializer.select_fields(request.query_params)
+    assert fast_recipes(request, fields) == drf_recipes(request, fields)
+
+
+def test_recipes_cover_all_cases(catalog_data, make_request):
+    request = make_request(catalog_data['reader'])
+    serializer = FastRecipeSerializer(request)
+    recipes = serializer.serialize(serializer.rows(Recipe.objects.all()))
+    assert {recipe['is_favorited'] for recipe in recipes} == {True, False}
+    assert {
+        recipe['is_in_shopping_cart'] for recipe in recipes
+    } == {True, False}
+    assert any(recipe['images'] == {} for recipe in recipes)
+    assert any(recipe['images'] for recipe in recipes)
+    assert any(recipe['tags'] == [] for recipe in recipes)
+    assert any(recipe['ingredients'] == [] for recipe in recipes)
+    assert any(recipe['author']['is_subscribed'] for recipe in recipes)
+
+
+def test_recipe_page_matches_drf(catalog_data, make_request):
+    request = make_request(catalog_data['reader'])
+    queryset = Recipe.objects.filter(author=catalog_data['authors'][1])
+    serializer = FastRecipeSerializer(request)
+    fast = serializer.serialize(serializer.rows(queryset)[:2])
+    drf = RecipeSerializer(
+        with_viewer_state(queryset, request.user)[:2],
+        many=True, context={'request': request}
+    ).data
+    assert render(fast) == render(drf)
+
+
+@pytest.mark.parametrize('limit', [None, 1, 2, 10])
+def test_subscriptions_match_drf(catalog_data, make_request, limit):
+    reader = catalog_data['reader']
+    request = make_request(
+        reader, f'?recipes_limit={limit}' if limit else ''
+    )
+    authors = User.objects.filter(author__user=reader).order_by('id')
+    drf = ShowSubscriptionsSerializer(
+        annotate_is_subscribed(authors, reader),
+        many=True, context={'request': request}
+    ).data
+    serializer = FastSubscriptionSerializer(request)
+    fast = serializer.serialize(serializer.rows(authors), limit)
+    assert render(fast) == render(drf)
+    # Среди подписок есть автор без рецептов.
+    assert any(author['recipes'] == [] for author in fast)
@@ -0,0 +1,71 @@
+"""
+Страницы ленты из FeedEntry.objects.page: материализованная лента
+и рецепты крупных авторов сливаются в один порядок без повторов.
+"""
+from recipes.models import FeedEntry, Recipe
+from users.models import Subscription, User
+
+
+def make_recipes(author, count):
+    return [
+        Recipe.objects.create(
+            author=author, name=f'{author.username} {number}', text='Текст',
+            cooking_time=1, image='recipes/images/1.jpg'
+        )
+        for number in range(count)
+    ]
+
+
+def test_feed_pages_merge_both_sources(db, settings):
+    settings.FEED_FANOUT_THRESHOLD = 1
+    small, large, reader, other = [
+        User.objects.create(username=name, email=f'{name}@example.com')
+        for name in ('small', 'large', 'reader', 'other')
+    ]
+    for author in (small, large):
+        Subscription.objects.create(user=reader, author=author)
+        author.refresh_from_db()
+    make_recipes(large, 3)
+    # Автор стал крупным: старые рецепты есть в ленте, новые — нет.
+    Subscription.objects.create(user=other, author=large)
+    large.refresh_from_db()
+    make_recipes(large, 2)
+    make_recipes(small, 4)
+    assert FeedEntry.objects.filter(user=reader).count() == 7
+    expected = [
+        (recipe.pub_date, recipe.id)
+        for recipe in Recipe.objects.order_by('-pub_date', '-id')
+    ]
+    assert len(expected) == 9
+
+    keys, position, has_more = [], None, True
+    while has_more:
+        page, has_more = FeedEntry.objects.page(reader, 4, position)
+        keys += page
+        position = page[-1]
+    assert keys == expected
+
+    page, has_more = FeedEntry.objects.page(
+        reader, 4, expected[6], reverse=True
+    )
+    assert page == expected[2:6] and has_more
+    page, has_more = FeedEntry.objects.page(
+        reader, 4, expected[2], reverse=True
+    )
+    assert page == expected[:2] and not has_more
+
+
+def test_prune_removes_several_authors(db):
+    authors = [
+        User.objects.create(username=name, email=f'{name}@example.com')
+        for name in ('first', 'second', 'third')
+    ]
+    reader = User.objects.create(username='reader', email='r@example.com')
+    for author in authors:
+        make_recipes(author, 2)
+    FeedEntry.objects.backfill(reader, authors)
+    assert FeedEntry.objects.filter(user=reader).count() == 6
+    FeedEntry.objects.prune(reader, [author.id for author in authors[:2]])
+    assert list(FeedEntry.objects.filter(user=reader).values_list(
+        'author', flat=True
+    ).distinct()) == [authors[2].id]
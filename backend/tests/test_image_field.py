@@ -0,0 +1,59 @@
+"""
+StreamingBase64ImageField декодирует картинку кусками и принимает
+то же, что Base64ImageField.
+"""
+import base64
+import io
+
+import pytest
+from PIL import Image
+from rest_framework import serializers
+
+from api.serializers import StreamingBase64ImageField
+
+
+def encoded_image(image_format='PNG', size=(300, 200)):
+    buffer = io.BytesIO()
+    Image.effect_noise(size, 64).convert('RGB').save(buffer, image_format)
+    return buffer.getvalue(), base64.b64encode(buffer.getvalue()).decode()
+
+
+@pytest.fixture
+def field():
+    field = StreamingBase64ImageField()
+    field.chunk_size = 1001
+    return field
+
+
+@pytest.mark.parametrize('image_format, extension', [
+    ('PNG', 'png'), ('JPEG', 'jpg'), ('GIF', 'gif')
+])
+def test_decodes_in_chunks(field, image_format, extension):
+    raw, encoded = encoded_image(image_format)
+    # Переносы строк сдвигают границы кусков относительно групп base64.
+    wrapped = '\n'.join(
+        encoded[start:start + 76] for start in range(0, len(encoded), 76)
+    )
+    file = field.to_internal_value(
+        f'data:image/{extension};base64,{wrapped}'
+    )
+    assert file.name.endswith(f'.{extension}')
+    assert file.size == len(raw)
+    assert file.read() == raw
+
+
+@pytest.mark.parametrize('value', [
+    'data:image/png;base64,не base64',
+    'data:image/png;base64,' + base64.b64encode(b'not an image').decode(),
+    'data:image/png;base64,' + encoded_image()[1][:-3],
+    'data:image/png;base64,',
+])
+def test_rejects_broken_images(field, value):
+    with pytest.raises(serializers.ValidationError):
+        field.to_internal_value(value)
+
+
+def test_rejects_other_image_types(field):
+    _, encoded = encoded_image('BMP')
+    with pytest.raises(serializers.ValidationError):
+        field.to_internal_value(encoded)
@@ -0,0 +1,39 @@
+"""
+Индекс ингредиентов пересобирается по метке версии INGREDIENTS,
+в том числе когда ингредиенты меняются во время сборки.
+"""
+from api.ingredient_index import IngredientPrefixIndex
+from recipes.models import Ingredient
+
+
+def names(index, prefix):
+    return [item['name'] for item in index.search(prefix, 10)]
+
+
+def test_index_follows_version_stamp(db):
+    Ingredient.objects.create(name='соль', measurement_unit='г')
+    index, other_worker = IngredientPrefixIndex(), IngredientPrefixIndex()
+    assert names(index, 'со') == names(other_worker, 'со') == ['соль']
+    # Сигнал сдвигает метку, и индекс обоих процессов устаревает.
+    Ingredient.objects.create(name='соус', measurement_unit='г')
+    assert names(index, 'со') == names(other_worker, 'со') == [
+        'соль', 'соус'
+    ]
+
+
+def test_change_during_build_is_not_lost(db, monkeypatch):
+    Ingredient.objects.create(name='соль', measurement_unit='г')
+    index = IngredientPrefixIndex()
+    build = index.build
+
+    def build_then_change(version):
+        try:
+            return build(version)
+        finally:
+            # Ингредиент добавлен после чтения таблицы, но до публикации.
+            Ingredient.objects.create(name='сода', measurement_unit='г')
+
+    monkeypatch.setattr(index, 'build', build_then_change)
+    assert names(index, 'со') == ['соль']
+    monkeypatch.setattr(index, 'build', build)
+    assert names(index, 'со') == ['сода', 'соль']
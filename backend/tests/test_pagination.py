@@ -0,0 +1,53 @@
+"""
+Курсорная навигация ?pagination=cursor идёт в порядке, который задали
+сортировка и поиск, а для порядка по изменчивым полям отвечает 400.
+"""
+import pytest
+from django.core.cache import cache
+from rest_framework.test import APIClient
+
+URL = '/api/v1/recipes/'
+
+
+@pytest.fixture
+def client():
+    cache.clear()
+    return APIClient()
+
+
+def walk(client, query):
+    """ id рецептов со всех курсорных страниц по две записи. """
+
+    ids = []
+    response = client.get(f'{URL}?pagination=cursor&limit=2{query}')
+    while True:
+        assert response.status_code == 200, response.data
+        ids += [recipe['id'] for recipe in response.data['results']]
+        if not response.data['next']:
+            return ids
+        response = client.get(response.data['next'])
+
+
+@pytest.mark.parametrize('query, ordering', [
+    ('', ('-pub_date', '-id')),
+    ('&ordering=pub_date', ('pub_date', '-id')),
+    ('&ordering=-id', ('-id',)),
+])
+def test_cursor_follows_ordering(client, catalog_data, query, ordering):
+    recipes = sorted(catalog_data['recipes'], key=lambda recipe: recipe.id)
+    for field in reversed(ordering):
+        recipes.sort(
+            key=lambda recipe: getattr(recipe, field.lstrip('-')),
+            reverse=field.startswith('-')
+        )
+    assert walk(client, query) == [recipe.id for recipe in recipes]
+
+
+@pytest.mark.parametrize('query', [
+    '&search=Рецепт', '&ordering=-favorites_count',
+])
+def test_cursor_rejects_unstable_ordering(client, catalog_data, query):
+    response = client.get(f'{URL}?pagination=cursor{query}')
+    assert response.status_code == 400
+    assert 'pagination' in response.data
+    assert client.get(f'{URL}?limit=2{query}').status_code == 200
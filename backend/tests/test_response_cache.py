@@ -0,0 +1,92 @@
+"""
+Кеш ответов CachedResponseMixin: кешируются только анонимные запросы,
+а закешированный ответ отдаётся только после проверки прав и с учётом
+If-None-Match и If-Modified-Since.
+"""
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from rest_framework.permissions import BasePermission
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory, force_authenticate
+from rest_framework.views import APIView
+
+from api.cache import CachedResponseMixin
+from foodgram.versions import RECIPES
+
+
+class Switch(BasePermission):
+    allowed = True
+
+    def has_permission(self, request, view):
+        return self.allowed
+
+
+class CountingView(CachedResponseMixin, APIView):
+    cache_scopes = (RECIPES,)
+    permission_classes = [Switch]
+    calls = 0
+
+    def get(self, request):
+        CountingView.calls += 1
+        response = Response({'user': request.user.id})
+        response['ETag'] = '"etag"'
+        response['Last-Modified'] = 'Wed, 21 Oct 2015 07:28:00 GMT'
+        return response
+
+
+@pytest.fixture
+def view():
+    cache.clear()
+    CountingView.calls = 0
+    Switch.allowed = True
+    yield CountingView.as_view()
+    Switch.allowed = True
+
+
+def get(view, user=None, **headers):
+    request = APIRequestFactory().get('/cached/', **headers)
+    force_authenticate(request, user or AnonymousUser())
+    response = view(request)
+    response.render()
+    return response
+
+
+def test_hit_skips_view(view):
+    assert get(view).content == get(view).content
+    assert CountingView.calls == 1
+
+
+def test_authenticated_requests_bypass_cache(view, catalog_data):
+    reader = catalog_data['reader']
+    get(view)
+    assert get(view, reader).data == {'user': reader.id}
+    assert get(view, reader).data == {'user': reader.id}
+    assert get(view).data == {'user': None}
+    assert CountingView.calls == 3
+
+
+def test_hit_checks_permissions(view):
+    get(view)
+    Switch.allowed = False
+    assert get(view).status_code == 403
+
+
+@pytest.mark.parametrize('headers', [
+    {'HTTP_IF_NONE_MATCH': 'W/"etag"'},
+    {'HTTP_IF_MODIFIED_SINCE': 'Wed, 21 Oct 2015 07:28:00 GMT'},
+])
+def test_hit_honours_conditional_headers(view, headers):
+    get(view)
+    response = get(view, **headers)
+    assert response.status_code == 304
+    assert response['ETag'] == '"etag"'
+    assert CountingView.calls == 1
+
+
+def test_hit_ignores_older_if_modified_since(view):
+    get(view)
+    response = get(
+        view, HTTP_IF_MODIFIED_SINCE='Tue, 20 Oct 2015 07:28:00 GMT'
+    )
+    assert response.status_code == 200
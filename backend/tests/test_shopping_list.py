@@ -0,0 +1,110 @@
+"""
+Список покупок ShoppingListItem поддерживается сигналами при любом
+изменении корзин и состава рецептов, в том числе каскадном.
+"""
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api.serializers import CreateRecipeSerializer
+from recipes.models import (Ingredient, Recipe, RecipeIngredient, ShoppingCart,
+                            ShoppingListItem)
+from users.models import User
+
+
+def shopping_lists():
+    return {
+        (item.user_id, item.ingredient_id): item.amount
+        for item in ShoppingListItem.objects.all()
+    }
+
+
+def from_carts():
+    return {
+        (row['user_id'], row['ingredient_id']): row['total']
+        for row in ShoppingListItem.objects.from_carts()
+    }
+
+
+def test_shopping_lists_follow_every_change(catalog_data):
+    reader = catalog_data['reader']
+    recipes = catalog_data['recipes']
+    other = User.objects.create(username='other', email='o@example.com')
+    ShoppingCart.objects.create(user=other, recipe=recipes[3])
+    ShoppingCart.objects.create(user=other, recipe=recipes[1])
+    assert shopping_lists() == from_carts()
+    assert shopping_lists()
+
+    # Правка состава, как во встроенной форме админки.
+    item = RecipeIngredient.objects.filter(recipe=recipes[3]).first()
+    item.amount += 10
+    item.save()
+    item.ingredient = Ingredient.objects.create(
+        name='новый', measurement_unit='шт'
+    )
+    item.save()
+    RecipeIngredient.objects.create(
+        recipe=recipes[4], ingredient=item.ingredient, amount=2
+    )
+    RecipeIngredient.objects.filter(recipe=recipes[4]).first().delete()
+    assert shopping_lists() == from_carts()
+
+    ShoppingCart.objects.filter(user=reader, recipe=recipes[4]).delete()
+    assert shopping_lists() == from_carts()
+
+    recipes[3].delete()
+    assert shopping_lists() == from_carts()
+
+    catalog_data['authors'][1].delete()
+    assert not Recipe.objects.filter(pk=recipes[1].pk).exists()
+    assert shopping_lists() == from_carts()
+
+    other.delete()
+    assert shopping_lists() == from_carts() == {}
+
+
+def test_apply_sums_and_removes_rows(db):
+    user = User.objects.create(username='user', email='u@example.com')
+    ingredient = Ingredient.objects.create(name='соль', measurement_unit='г')
+    key = (user.id, ingredient.id)
+    ShoppingListItem.objects.apply({key: 3})
+    ShoppingListItem.objects.apply({key: 4})
+    assert shopping_lists() == {key: 7}
+    ShoppingListItem.objects.apply({key: -7})
+    assert shopping_lists() == {}
+
+
+def update_queries(recipe, ingredients):
+    with CaptureQueriesContext(connection) as queries:
+        CreateRecipeSerializer().update_ingredients(ingredients, recipe)
+    return len(queries)
+
+
+def test_update_ingredients_runs_constant_queries(catalog_data):
+    recipe = catalog_data['recipes'][3]
+    for number in range(3):
+        user = User.objects.create(
+            username=f'cart{number}', email=f'cart{number}@example.com'
+        )
+        ShoppingCart.objects.create(user=user, recipe=recipe)
+    extra = [
+        Ingredient.objects.create(
+            name=f'лишний {number}', measurement_unit='г'
+        )
+        for number in range(40)
+    ]
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=1)
+        for ingredient in extra
+    )
+    current = [
+        {'id': ingredient_id, 'amount': amount}
+        for ingredient_id, amount in RecipeIngredient.objects.filter(
+            recipe=recipe
+        ).values_list('ingredient_id', 'amount')
+    ]
+    ShoppingListItem.objects.rebuild()
+    one_removed = update_queries(recipe, current[:-1])
+    assert shopping_lists() == from_carts()
+    many_removed = update_queries(recipe, current[:2])
+    assert shopping_lists() == from_carts()
+    assert many_removed == one_removed
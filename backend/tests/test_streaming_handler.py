@@ -0,0 +1,74 @@
+"""
+Потоковые ответы под ASGI: foodgram.handlers.StreamingASGIHandler
+отдаёт порции по мере готовности, а при отключении клиента
+останавливает генератор и закрывает ответ.
+"""
+import asyncio
+import threading
+
+import pytest
+from django.http import StreamingHttpResponse
+
+from foodgram.handlers import StreamingASGIHandler
+
+
+class Client:
+    """ Сообщения ASGI, полученные клиентом. """
+
+    def __init__(self):
+        self.messages = []
+
+    async def send(self, message):
+        self.messages.append(message)
+
+
+def collect(handler, response):
+    client = Client()
+    asyncio.run(handler.send_response(response, client.send))
+    return client.messages
+
+
+def test_streams_parts_without_content_length():
+    response = StreamingHttpResponse(
+        part.encode() for part in ('раз', 'два', 'три')
+    )
+    start, *body = collect(StreamingASGIHandler(), response)
+    assert start['type'] == 'http.response.start'
+    assert b'Content-Length' not in dict(start['headers'])
+    assert [message['body'] for message in body[:-1]] == [
+        part.encode() for part in ('раз', 'два', 'три')
+    ]
+    assert all(message['more_body'] for message in body[:-1])
+    assert not body[-1].get('more_body')
+
+
+def test_client_disconnect_stops_generator():
+    closed = threading.Event()
+    produced = []
+
+    def parts():
+        for number in range(1000):
+            produced.append(number)
+            yield b'x'
+
+    response = StreamingHttpResponse(parts())
+    response._resource_closers.append(closed.set)
+
+    async def run():
+        stream = StreamingASGIHandler().stream(response)
+        for _ in range(3):
+            await stream.__anext__()
+        await stream.aclose()
+
+    asyncio.run(run())
+    assert closed.wait(5)
+    assert len(produced) < 1000
+
+
+def test_generator_error_is_raised():
+    def parts():
+        yield b'x'
+        raise RuntimeError('сбой выгрузки')
+
+    with pytest.raises(RuntimeError, match='сбой выгрузки'):
+        collect(StreamingASGIHandler(), StreamingHttpResponse(parts()))
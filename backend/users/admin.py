@@ -1,27 +1,29 @@
 from django.contrib import admin
 
-from foodgram.settings import EMPTY
+from foodgram.admin import LargeTableAdmin
 
 from .models import Subscription, User
 
 
 @admin.register(User)
-class UserAdmin(admin.ModelAdmin):
-    list_display = ['username', 'email', 'first_name', 'last_name']
+class UserAdmin(LargeTableAdmin):
+    list_display = [
+        'username', 'email', 'first_name', 'last_name', 'recipes_count'
+    ]
     search_fields = ['username', 'email']
-    list_filter = ['username', 'email']
+    list_filter = ['role']
     ordering = ['username']
-    empty_value_display = EMPTY
+    readonly_fields = ['recipes_count']
 
 
 @admin.register(Subscription)
-class SubscriptionAdmin(admin.ModelAdmin):
+class SubscriptionAdmin(LargeTableAdmin):
     list_display = ['user', 'author']
+    list_select_related = ['user', 'author']
     search_fields = [
         'author__username',
         'author__email',
         'user__username',
         'user__email'
     ]
-    list_filter = ['author__username', 'user__username']
-    empty_value_display = EMPTY
+    autocomplete_fields = ['user', 'author']
@@ -0,0 +1,31 @@
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_recipes_count(apps, schema_editor):
+    user = apps.get_model('users', 'User')
+    recipe = apps.get_model('recipes', 'Recipe')
+    user.objects.update(recipes_count=Coalesce(Subquery(
+        recipe.objects.filter(author=OuterRef('pk')).values(
+            'author'
+        ).annotate(total=Count('pk')).values('total')[:1],
+        output_field=models.PositiveIntegerField()
+    ), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_auto_20230420_1521'),
+        ('recipes', '0012_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='recipes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='число рецептов'),
+        ),
+        migrations.RunPython(fill_recipes_count, migrations.RunPython.noop),
+    ]
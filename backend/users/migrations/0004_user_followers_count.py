@@ -0,0 +1,30 @@
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_followers_count(apps, schema_editor):
+    user = apps.get_model('users', 'User')
+    subscription = apps.get_model('users', 'Subscription')
+    user.objects.update(followers_count=Coalesce(Subquery(
+        subscription.objects.filter(author=OuterRef('pk')).values(
+            'author'
+        ).annotate(total=Count('pk')).values('total')[:1],
+        output_field=models.PositiveIntegerField()
+    ), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_user_recipes_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='число подписчиков'),
+        ),
+        migrations.RunPython(fill_followers_count, migrations.RunPython.noop),
+    ]
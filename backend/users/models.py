@@ -47,6 +47,16 @@ class User(AbstractUser):
         choices=ROLES,
         default=ROLE_USER
     )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='число рецептов',
+        default=0,
+        editable=False
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='число подписчиков',
+        default=0,
+        editable=False
+    )
 
     def __str__(self):
         return self.username